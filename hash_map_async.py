@@ -0,0 +1,294 @@
+# Description: This file contains an AsyncHashMap class, an asyncio facade over the HashMap classes in
+# hash_map_sc and hash_map_oa. It offers awaitable put, get, contains_key, remove and their batch
+# variants (put_many, get_many, remove_many). When the wrapped map needs to grow, the rehash is done
+# cooperatively: buckets are migrated into the new table a few at a time by a background task that
+# yields to the event loop between batches. While a migration is in progress every key lives in
+# exactly one of the two tables, so reads and writes from other tasks stay correct throughout.
+
+import asyncio
+import time
+
+from a6_include import DynamicArray
+
+
+class AsyncHashMap:
+    def __init__(self, hash_map, yield_every: int = 64) -> None:
+        """
+        Wraps an existing hash_map_sc or hash_map_oa HashMap. yield_every is the number of buckets
+        migrated, or batch operations performed, between yields to the event loop.
+        """
+        if yield_every < 1:
+            raise ValueError("yield_every must be at least 1")
+
+        self._map = hash_map
+        self._yield_every = yield_every
+
+        # Table being filled and the task filling it while a resize is in progress, otherwise None.
+        self._new_map = None
+        self._migration = None
+
+    def get_size(self) -> int:
+        """
+        Returns the number of keys in the map, counting both tables during a resize.
+        """
+        if self._new_map is not None:
+            return self._map.get_size() + self._new_map.get_size()
+        return self._map.get_size()
+
+    def get_capacity(self) -> int:
+        """
+        Returns the capacity of the map, which is the capacity being migrated to during a resize.
+        """
+        if self._new_map is not None:
+            return self._new_map.get_capacity()
+        return self._map.get_capacity()
+
+    def is_resizing(self) -> bool:
+        """
+        Returns True while a cooperative resize is in progress.
+        """
+        return self._new_map is not None
+
+    # ------------------------------------------------------------------ #
+
+    async def put(self, key: str, value: object) -> None:
+        """
+        Puts a key-value pair into the map. Instead of letting the wrapped map rehash everything
+        at once, a cooperative resize is started whenever its put would rehash, either because
+        the load factor reached the map's limit or to clear out tombstones.
+        """
+        if self._new_map is None:
+            new_capacity = self._map._rehash_capacity()
+            if not new_capacity:
+                self._map.put(key, value)
+                return
+            self._start_resize(new_capacity)
+        elif self._new_map._rehash_capacity(self._map.get_size()):
+            # The new table would have to rehash itself synchronously before it holds the keys
+            # still waiting in the old one, so let the migration finish first.
+            await asyncio.shield(self._migration)
+            await self.put(key, value)
+            return
+
+        # Keys written during a resize always go to the new table.
+        self._map.remove(key)
+        self._new_map.put(key, value)
+
+    async def get(self, key: str) -> object:
+        """
+        Returns a key's value, or None if the key is not in the map.
+        """
+        if self._new_map is not None and self._new_map.contains_key(key):
+            return self._new_map.get(key)
+        return self._map.get(key)
+
+    async def contains_key(self, key: str) -> bool:
+        """
+        Returns True if the key is in the map, otherwise False.
+        """
+        if self._new_map is not None and self._new_map.contains_key(key):
+            return True
+        return self._map.contains_key(key)
+
+    async def remove(self, key: str) -> None:
+        """
+        Removes a key from the map, whichever table it currently lives in.
+        """
+        self._map.remove(key)
+        if self._new_map is not None:
+            self._new_map.remove(key)
+
+    async def put_many(self, pairs) -> None:
+        """
+        Puts every (key, value) pair from an iterable, yielding to the event loop every
+        yield_every pairs.
+        """
+        count = 0
+        for key, value in pairs:
+            await self.put(key, value)
+            count += 1
+            if count % self._yield_every == 0:
+                await asyncio.sleep(0)
+
+    async def get_many(self, keys) -> DynamicArray:
+        """
+        Returns a new array with the value of each key (None for missing keys), yielding to
+        the event loop every yield_every keys.
+        """
+        new_arr = DynamicArray()
+        count = 0
+        for key in keys:
+            new_arr.append(await self.get(key))
+            count += 1
+            if count % self._yield_every == 0:
+                await asyncio.sleep(0)
+        return new_arr
+
+    async def remove_many(self, keys) -> None:
+        """
+        Removes every key from an iterable, yielding to the event loop every yield_every keys.
+        """
+        count = 0
+        for key in keys:
+            await self.remove(key)
+            count += 1
+            if count % self._yield_every == 0:
+                await asyncio.sleep(0)
+
+    async def resize_table(self, new_capacity: int) -> None:
+        """
+        Resizes the map to a new capacity and waits until the cooperative migration is done.
+        Capacities too small to hold the current keys at the map's load limit are ignored, since
+        the new table would otherwise have to rehash itself in one go mid-migration.
+        """
+        # Another task may start a migration while this one waits, so wait until none is left,
+        # then check and start without awaiting in between.
+        await self.wait_resized()
+        if new_capacity < 1 or new_capacity * self._map.MAX_LOAD <= self._map.get_size():
+            return
+        self._start_resize(new_capacity)
+        await self.wait_resized()
+
+    async def wait_resized(self) -> None:
+        """
+        Waits until no resize is in progress, including any started by other tasks meanwhile.
+        """
+        while self._migration is not None:
+            await asyncio.shield(self._migration)
+
+    # ------------------------------------------------------------------ #
+
+    def _start_resize(self, new_capacity: int) -> None:
+        """
+        Creates the new table and schedules the task that migrates buckets into it.
+        """
+        self._new_map = type(self._map)(new_capacity, self._map._hash_function)
+        self._migration = asyncio.ensure_future(self._migrate())
+
+    async def _migrate(self) -> None:
+        """
+        Moves every bucket of the old table into the new one, yielding to the event loop every
+        yield_every buckets. Once done, the wrapped map takes over the new table's buckets, the
+        same way resize_table swaps them in.
+        """
+        old_map = self._map
+        new_map = self._new_map
+
+        for i in range(old_map.get_capacity()):
+            for key, value in old_map.get_bucket_keys_and_values(i):
+                new_map.put(key, value)
+                old_map.remove(key)
+            if (i + 1) % self._yield_every == 0:
+                await asyncio.sleep(0)
+
+        old_map._adopt(new_map)
+
+        self._new_map = None
+        self._migration = None
+
+
+# ------------------- BASIC TESTING ---------------------------------------- #
+
+async def _event_loop_lag(writer, interval: float = .001) -> (float, float, float):
+    """
+    Runs writer while a ticker task sleeps for interval seconds at a time, and returns the
+    elapsed time along with the worst and 99th percentile delay of the ticker's wake-ups.
+    """
+    lags = []
+    done = False
+
+    async def ticker():
+        while not done:
+            start = time.perf_counter()
+            await asyncio.sleep(interval)
+            lags.append(time.perf_counter() - start - interval)
+
+    ticker_task = asyncio.ensure_future(ticker())
+    await asyncio.sleep(0)
+    start = time.perf_counter()
+    await writer()
+    elapsed = time.perf_counter() - start
+    done = True
+    await ticker_task
+
+    lags.sort()
+    return elapsed, lags[-1], lags[len(lags) * 99 // 100]
+
+
+async def _concurrent_check(am, seed: int, tasks: int = 4, operations: int = 3000) -> bool:
+    """
+    Runs tasks that mix put, remove, get and the occasional resize_table on am, checks every
+    get against a dict, and returns True if am matches the dict at the end.
+    """
+    import random
+
+    expected = {}
+    correct = True
+
+    async def worker(number):
+        nonlocal correct
+        rng = random.Random(seed * tasks + number)
+        for i in range(operations):
+            key = 'key' + str(rng.randrange(400))
+            choice = rng.random()
+            if choice < .5:
+                await am.put(key, i)
+                expected[key] = i
+            elif choice < .75:
+                await am.remove(key)
+                expected.pop(key, None)
+            elif choice < .995:
+                correct &= await am.get(key) == expected.get(key)
+            else:
+                await am.resize_table(rng.randrange(50, 2000))
+            if i % 7 == 0:
+                await asyncio.sleep(0)
+
+    await asyncio.gather(*(worker(number) for number in range(tasks)))
+    await am.wait_resized()
+    correct &= am.get_size() == len(expected)
+    for key, value in expected.items():
+        correct &= await am.get(key) == value
+    return correct
+
+
+if __name__ == "__main__":
+
+    from a6_include import hash_function_1
+    from hash_map_oa import HashMap as OAHashMap
+    from hash_map_sc import HashMap as SCHashMap
+
+    print("\nConcurrent put, remove, get and resize_table")
+    print("--------------------------------------------")
+    for name, map_class in (("SC", SCHashMap), ("OA", OAHashMap)):
+        results = [asyncio.run(_concurrent_check(AsyncHashMap(map_class(11, hash_function_1), 4), seed))
+                   for seed in range(3)]
+        print(name, results)
+
+    print("\nEvent loop lag under heavy insert load")
+    print("--------------------------------------")
+    size = 200000
+    pairs = [('key' + str(i), i) for i in range(size)]
+
+    for name, map_class in (("SC", SCHashMap), ("OA", OAHashMap)):
+        m = map_class(11, hash)
+
+        async def blocking_writer():
+            # Yields just as often as the facade does, but every resize runs in one go.
+            for i, (key, value) in enumerate(pairs):
+                m.put(key, value)
+                if i % 64 == 0:
+                    await asyncio.sleep(0)
+
+        elapsed, worst, p99 = asyncio.run(_event_loop_lag(blocking_writer))
+        print(f"{name} blocking: {elapsed:.2f}s, max lag {worst * 1000:.1f}ms, p99 lag {p99 * 1000:.1f}ms")
+
+        am = AsyncHashMap(map_class(11, hash))
+
+        async def async_writer():
+            await am.put_many(pairs)
+            await am.wait_resized()
+
+        elapsed, worst, p99 = asyncio.run(_event_loop_lag(async_writer))
+        result = am.get_size() == size and asyncio.run(am.get('key' + str(size - 1))) == size - 1
+        print(f"{name} async:    {elapsed:.2f}s, max lag {worst * 1000:.1f}ms, p99 lag {p99 * 1000:.1f}ms, {result}")
@@ -0,0 +1,903 @@
+# Description: This file contains the benchmark and load-test harness for the hash maps in hash_map_sc
+# and hash_map_oa. The run command sweeps implementations, workloads, table sizes and starting load
+# factors. For each case it reports throughput, per-operation latency percentiles, memory per entry
+# and chain or probe statistics as JSON. A previous JSON report can be passed as a baseline, and the
+# command exits with status 1 when a case is slower than the baseline by more than the tolerance.
+#
+# Workloads: uniform, zipfian, sequential, adversarial, read_heavy, write_heavy and churn. The
+# adversarial keys target hash_function_1, so pair that workload with --hash hash_function_1.
+#
+# Example: python hash_map_bench.py run --impl sc oa --size 1000 10000 --output report.json
+#
+# The other commands each measure one feature against the plain maps:
+#   instrumentation  put/get throughput with instrumentation never enabled, switched off, and on
+#   bloom            miss-heavy get throughput with and without a Bloom filter, and its memory cost
+#   primes           prime capacity lookup, construction and resize cost for large tables
+#   clear            create, clear and refill cycles of request-scoped maps at growing capacities
+#   typed            memory and throughput of IntHashMap and BytesHashMap against the generic maps
+#   multimap         group-by with MultiHashMap.add against get-then-put of a list value
+#   join             hash join and intersection against a get_keys_and_values/contains_key loop
+#   external         ExternalHashMap loading and lookups with only part of the data in memory
+
+import argparse
+import itertools
+import json
+import platform
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from a6_include import hash_function_1, hash_function_2
+from hash_map_bloom import BloomHashMap
+from hash_map_external import ExternalHashMap
+from hash_map_hashing import crc32_hash
+from hash_map_metrics import HashMapMetrics
+from hash_map_oa import HashMap as OAHashMap
+from hash_map_parallel import bulk_build
+from hash_map_primes import PRIMES, next_prime
+from hash_map_sc import HashMap as SCHashMap
+from hash_map_sc import MultiHashMap
+from hash_map_typed import BytesHashMap, IntHashMap
+
+
+IMPLEMENTATIONS = {
+    "sc": SCHashMap,
+    "oa": OAHashMap,
+}
+
+WORKLOADS = ("uniform", "zipfian", "sequential", "adversarial", "read_heavy", "write_heavy", "churn")
+
+GET, PUT, REMOVE = 0, 1, 2
+
+
+HASH_FUNCTIONS = {
+    "crc32": crc32_hash,
+    "hash_function_1": hash_function_1,
+    "hash_function_2": hash_function_2,
+}
+
+
+# ------------------------------------------------------------------ #
+
+def make_keys(workload: str, size: int) -> list:
+    """
+    Returns the keys a workload preloads into the map. The adversarial keys are distinct
+    arrangements of the same letters, so they all collide under hash_function_1.
+    """
+    if workload == "adversarial":
+        arrangements = itertools.islice(itertools.permutations('abcdefghijk'), size)
+        return [''.join(letters) for letters in arrangements]
+    return ['key' + str(i) for i in range(size)]
+
+
+def make_operations(workload: str, keys: list, count: int, rng: random.Random) -> list:
+    """
+    Returns a list of (operation, key) pairs for a workload over the preloaded keys.
+    """
+    size = len(keys)
+
+    if workload == "sequential":
+        return [(GET if i // size % 2 else PUT, keys[i % size]) for i in range(count)]
+
+    if workload == "zipfian":
+        weights = [1 / (rank + 1) ** 1.1 for rank in range(size)]
+        picks = rng.choices(keys, weights=weights, k=count)
+        return [(GET if rng.random() < .5 else PUT, key) for key in picks]
+
+    if workload == "churn":
+        # Removes existing keys and adds new ones, so the size stays about the same.
+        live = list(keys)
+        fresh = size
+        operations = []
+        for _ in range(count):
+            roll = rng.random()
+            if roll < .4:
+                key = 'key' + str(fresh)
+                fresh += 1
+                live.append(key)
+                operations.append((PUT, key))
+            elif roll < .8 and live:
+                index = rng.randrange(len(live))
+                live[index], live[-1] = live[-1], live[index]
+                operations.append((REMOVE, live.pop()))
+            else:
+                operations.append((GET, rng.choice(keys)))
+        return operations
+
+    read_share = {"read_heavy": .9, "write_heavy": .1}.get(workload, .5)
+    operations = []
+    for _ in range(count):
+        # A tenth of the reads ask for keys that are not in the map.
+        if rng.random() < read_share:
+            if rng.random() < .1:
+                operations.append((GET, 'miss' + str(rng.randrange(size))))
+            else:
+                operations.append((GET, rng.choice(keys)))
+        else:
+            operations.append((PUT, rng.choice(keys)))
+    return operations
+
+
+def percentile(ordered: list, fraction: float) -> float:
+    """
+    Returns the value at a fraction of an ordered list, using the nearest rank.
+    """
+    if not ordered:
+        return 0
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def table_stats(hash_map) -> dict:
+    """
+    Returns chain length statistics for a separate chaining map, or probe length and tombstone
+    statistics for an open addressing map.
+    """
+    capacity = hash_map.get_capacity()
+
+    if isinstance(hash_map, SCHashMap):
+        lengths = [hash_map.get_bucket_keys_and_values(i).length() for i in range(capacity)]
+        chains = [length for length in lengths if length]
+        return {
+            "empty_buckets": capacity - len(chains),
+            "mean_chain": sum(chains) / len(chains) if chains else 0,
+            "max_chain": max(chains, default=0),
+        }
+
+    probes = []
+    tombstones = 0
+    function = hash_map._hash_function
+    for i in range(capacity):
+        node = hash_map._buckets[i]
+        if node is None:
+            continue
+        if node.is_tombstone:
+            tombstones += 1
+            continue
+        # Count the buckets a lookup of this key visits before reaching it.
+        home = function(node.key) % capacity
+        index = home
+        probe = 1
+        while index != i:
+            index = (home + probe**2) % capacity
+            probe += 1
+        probes.append(probe)
+    return {
+        "tombstones": tombstones,
+        "mean_probes": sum(probes) / len(probes) if probes else 0,
+        "max_probes": max(probes, default=0),
+    }
+
+
+def run_case(impl: str, function, workload: str, size: int, load_factor: float, count: int,
+             seed: int, repeat: int = 1) -> dict:
+    """
+    Runs one benchmark case and returns its results. The timed part runs repeat times on a
+    freshly loaded map, and the fastest run is reported.
+    """
+    map_class = IMPLEMENTATIONS[impl]
+    rng = random.Random(seed)
+    keys = make_keys(workload, size)
+    operations = make_operations(workload, keys, count, rng)
+    capacity = max(1, int(size / load_factor))
+
+    # Memory per entry comes from a separate traced build, since tracing slows everything down.
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    m = map_class(capacity, function)
+    for i, key in enumerate(keys):
+        m.put(key, i)
+    memory = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del m
+
+    best = None
+    for _ in range(repeat):
+        m = map_class(capacity, function)
+        for i, key in enumerate(keys):
+            m.put(key, i)
+
+        put, get, remove = m.put, m.get, m.remove
+        clock = time.perf_counter_ns
+        latencies = [0] * len(operations)
+        start = clock()
+        for i, (operation, key) in enumerate(operations):
+            begin = clock()
+            if operation == GET:
+                get(key)
+            elif operation == PUT:
+                put(key, i)
+            else:
+                remove(key)
+            latencies[i] = clock() - begin
+        elapsed = clock() - start
+
+        if best is None or elapsed < best[0]:
+            best = elapsed, latencies, m
+    elapsed, latencies, m = best
+    latencies.sort()
+
+    return {
+        "impl": impl,
+        "workload": workload,
+        "size": size,
+        "load_factor": load_factor,
+        "ops": len(operations),
+        "ops_per_sec": len(operations) / (elapsed / 1e9) if elapsed else 0,
+        "latency_ns": {
+            "p50": percentile(latencies, .5),
+            "p90": percentile(latencies, .9),
+            "p99": percentile(latencies, .99),
+            "max": latencies[-1] if latencies else 0,
+        },
+        "memory_bytes_per_entry": memory / size if size else 0,
+        "final_size": m.get_size(),
+        "capacity": m.get_capacity(),
+        "load": m.table_load(),
+        "stats": table_stats(m),
+    }
+
+
+def case_id(result: dict) -> tuple:
+    """
+    Returns the fields that identify a case across reports. Cases that differ in hash function,
+    operation count or seed are not comparable, so they count as different cases.
+    """
+    return (result["impl"], result["workload"], result["size"], result["load_factor"],
+            result["hash"], result["ops"], result["seed"])
+
+
+def compare(results: list, baseline: list, tolerance: float) -> (list, list):
+    """
+    Returns a description of every case whose throughput dropped, or whose p99 latency grew,
+    by more than tolerance compared with the matching baseline case, and a list of the cases
+    that have no matching baseline case.
+    """
+    previous = {case_id(result): result for result in baseline}
+    regressions = []
+    unmatched = []
+    for result in results:
+        old = previous.get(case_id(result))
+        if old is None:
+            unmatched.append(case_id(result))
+            continue
+        if result["ops_per_sec"] < old["ops_per_sec"] * (1 - tolerance):
+            regressions.append({"case": case_id(result), "metric": "ops_per_sec",
+                                "baseline": old["ops_per_sec"], "current": result["ops_per_sec"]})
+        if result["latency_ns"]["p99"] > old["latency_ns"]["p99"] * (1 + tolerance):
+            regressions.append({"case": case_id(result), "metric": "latency_ns.p99",
+                                "baseline": old["latency_ns"]["p99"],
+                                "current": result["latency_ns"]["p99"]})
+    return regressions, unmatched
+
+
+def command_run(args) -> int:
+    """
+    Runs the sweep described by the command-line arguments and writes the JSON report.
+    """
+    function = HASH_FUNCTIONS[args.hash]
+    results = []
+    for impl in args.impl:
+        for workload in args.workload:
+            for size in args.size:
+                for load_factor in args.load_factor:
+                    result = run_case(impl, function, workload, size, load_factor,
+                                      args.ops or size, args.seed, args.repeat)
+                    result["hash"] = args.hash
+                    result["seed"] = args.seed
+                    results.append(result)
+                    print(f"{impl} {workload:<11} size={size:<8} lf={load_factor:<5} "
+                          f"{result['ops_per_sec']:12,.0f} ops/s  "
+                          f"p99={result['latency_ns']['p99']:,}ns", file=sys.stderr)
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "hash": args.hash,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+
+    status = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            previous = json.load(f)
+        baseline = previous["results"]
+        # Reports from before the hash and seed were recorded per case only have them in meta.
+        for result in baseline:
+            result.setdefault("hash", previous["meta"].get("hash"))
+            result.setdefault("seed", previous["meta"].get("seed"))
+        report["regressions"], unmatched = compare(results, baseline, args.tolerance)
+        for case in unmatched:
+            print(f"WARNING {case} has no baseline case with the same hash, ops and seed",
+                  file=sys.stderr)
+        for regression in report["regressions"]:
+            print(f"REGRESSION {regression['case']} {regression['metric']}: "
+                  f"{regression['baseline']:,.0f} -> {regression['current']:,.0f}", file=sys.stderr)
+        if report["regressions"]:
+            status = 1
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return status
+
+
+def put_get_rate(map_class, function, keys: list, prepare=None) -> float:
+    """
+    Returns put and get calls per second for loading keys into a new map and reading them back.
+    prepare, if given, is called with the new map before the clock starts.
+    """
+    m = map_class(11, function)
+    if prepare is not None:
+        prepare(m)
+    put, get = m.put, m.get
+    start = time.perf_counter()
+    for i, key in enumerate(keys):
+        put(key, i)
+    for key in keys:
+        get(key)
+    return 2 * len(keys) / (time.perf_counter() - start)
+
+
+def switched_off(hash_map) -> None:
+    """
+    Enables and then disables instrumentation on a map.
+    """
+    hash_map.enable_instrumentation(HashMapMetrics())
+    hash_map.disable_instrumentation()
+
+
+def command_instrumentation(args) -> int:
+    """
+    Compares put/get throughput of maps that were never instrumented, maps whose
+    instrumentation was switched off again, and instrumented maps.
+    """
+    function = HASH_FUNCTIONS[args.hash]
+    keys = make_keys("uniform", args.size)
+    modes = {
+        "plain": None,
+        "disabled": switched_off,
+        "enabled": lambda m: m.enable_instrumentation(HashMapMetrics()),
+    }
+
+    results = []
+    for impl in args.impl:
+        # Alternate the modes on every round so drift affects them all alike; keep the best.
+        best = dict.fromkeys(modes, 0)
+        for _ in range(args.repeat):
+            for mode, prepare in modes.items():
+                rate = put_get_rate(IMPLEMENTATIONS[impl], function, keys, prepare)
+                best[mode] = max(best[mode], rate)
+        results.append({
+            "impl": impl,
+            "size": args.size,
+            "ops_per_sec": best,
+            "disabled_overhead": 1 - best["disabled"] / best["plain"],
+            "enabled_overhead": 1 - best["enabled"] / best["plain"],
+        })
+
+    print(json.dumps({"results": results}, indent=2))
+    return 0
+
+
+def command_bloom(args) -> int:
+    """
+    Compares get throughput of plain maps and maps behind a Bloom filter on a miss-heavy
+    lookup stream, and reports the filter's size and measured false positive rate.
+    """
+    rng = random.Random(args.seed)
+    keys = make_keys("uniform", args.size)
+    misses = ["miss" + str(i) for i in range(args.ops)]
+    lookups = [rng.choice(keys) if rng.random() < args.hit_ratio else misses[i]
+               for i in range(args.ops)]
+
+    results = []
+    for impl, name in itertools.product(args.impl, args.hash):
+        m = IMPLEMENTATIONS[impl](11, HASH_FUNCTIONS[name])
+        for i, key in enumerate(keys):
+            m.put(key, i)
+        bm = BloomHashMap(m, args.bits_per_key)
+
+        best = {"plain": 0, "bloom": 0}
+        for _ in range(args.repeat):
+            for mode, get in (("plain", m.get), ("bloom", bm.get)):
+                start = time.perf_counter()
+                for key in lookups:
+                    get(key)
+                best[mode] = max(best[mode], len(lookups) / (time.perf_counter() - start))
+
+        bloom = bm.get_filter()
+        results.append({
+            "impl": impl,
+            "hash": name,
+            "size": args.size,
+            "hit_ratio": args.hit_ratio,
+            "ops_per_sec": best,
+            "speedup": best["bloom"] / best["plain"],
+            "filter_bytes": bloom.memory_bytes(),
+            "filter_bytes_per_entry": bloom.memory_bytes() / args.size,
+            "false_positive_rate": sum(map(bloom.might_contain, misses)) / len(misses),
+        })
+
+    print(json.dumps({"results": results}, indent=2))
+    return 0
+
+
+def trial_division_next_prime(n: int) -> int:
+    """
+    The trial division search HashMap used before hash_map_primes, kept as the reference.
+    """
+    def is_prime(n):
+        if n == 2 or n == 3:
+            return True
+        if n == 1 or n % 2 == 0:
+            return False
+        factor = 3
+        while factor ** 2 <= n:
+            if n % factor == 0:
+                return False
+            factor += 2
+        return True
+
+    if n % 2 == 0:
+        n += 1
+    while not is_prime(n):
+        n += 2
+    return n
+
+
+def seconds_per_call(function, values: list, repeat: int) -> float:
+    """
+    Returns the fastest mean time in seconds of calling function on every value.
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for value in values:
+            function(value)
+        elapsed = (time.perf_counter() - start) / len(values)
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def command_primes(args) -> int:
+    """
+    Times the prime capacity search with trial division, the growth schedule and Miller-Rabin,
+    then construction and resize of large tables, then modulo against Lemire's fastmod.
+    """
+    scheduled = [2 * p for p in PRIMES if p <= args.max_capacity]
+    custom = [p + 1 for p in scheduled]
+    lookups = {
+        "schedule": {
+            "trial_division": seconds_per_call(trial_division_next_prime, scheduled, args.repeat),
+            "next_prime": seconds_per_call(next_prime, scheduled, args.repeat),
+        },
+        "custom": {
+            "trial_division": seconds_per_call(trial_division_next_prime, custom, args.repeat),
+            "next_prime": seconds_per_call(next_prime, custom, args.repeat),
+        },
+    }
+
+    tables = []
+    for impl, capacity in itertools.product(args.impl, args.capacity):
+        map_class = IMPLEMENTATIONS[impl]
+        construct = seconds_per_call(lambda c: map_class(c, crc32_hash), [capacity], args.repeat)
+
+        m = map_class(capacity, crc32_hash)
+        for i in range(int(m.get_capacity() * m.MAX_LOAD * .9)):
+            m.put("key" + str(i), i)
+        start = time.perf_counter()
+        m.resize_table(m.get_capacity() * 2)
+        resize = time.perf_counter() - start
+
+        tables.append({
+            "impl": impl,
+            "capacity": capacity,
+            "construct_seconds": construct,
+            "resize_seconds": resize,
+            "resize_keys": m.get_size(),
+        })
+
+    # Lemire's fastmod for 32-bit values: one multiply for the low bits, one for the result.
+    d = next_prime(args.max_capacity)
+    constant = (1 << 64) // d + 1
+    values = [crc32_hash("key" + str(i)) for i in range(100000)]
+    modulo = {
+        "divisor": d,
+        "percent": seconds_per_call(lambda a: a % d, values, args.repeat),
+        "fastmod": seconds_per_call(
+            lambda a: ((constant * a) & 0xFFFFFFFFFFFFFFFF) * d >> 64, values, args.repeat),
+    }
+
+    print(json.dumps({"next_prime_seconds": lookups, "tables": tables, "modulo_seconds": modulo},
+                     indent=2))
+    return 0
+
+
+def command_clear(args) -> int:
+    """
+    Times cycles of a request-scoped map: creating a map and filling it with a few keys, and
+    clearing an existing map and refilling it. With lazy buckets neither depends on capacity.
+    """
+    keys = make_keys("uniform", args.fill)
+
+    def fill(m):
+        for i, key in enumerate(keys):
+            m.put(key, i)
+            m.get(key)
+
+    results = []
+    for impl, capacity in itertools.product(args.impl, args.capacity):
+        map_class = IMPLEMENTATIONS[impl]
+        m = map_class(capacity, crc32_hash)
+        create = seconds_per_call(lambda _: fill(map_class(capacity, crc32_hash)),
+                                  range(args.cycles), args.repeat)
+        refill = seconds_per_call(lambda _: (m.clear(), fill(m)), range(args.cycles), args.repeat)
+        results.append({
+            "impl": impl,
+            "capacity": m.get_capacity(),
+            "fill": args.fill,
+            "create_and_fill_us": create * 1e6,
+            "clear_and_refill_us": refill * 1e6,
+        })
+
+    print(json.dumps({"results": results}, indent=2))
+    return 0
+
+
+def typed_case(name: str, make_map, keys: list, misses: list, repeat: int) -> dict:
+    """
+    Returns memory per entry and put, get and get_many throughput for one map on keys, with
+    the lookups half hits and half misses.
+    """
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    m = make_map()
+    for i, key in enumerate(keys):
+        m.put(key, i)
+    memory = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del m
+
+    lookups = [key for pair in zip(keys, misses) for key in pair]
+    best = {"put": 0, "get": 0, "get_many": 0}
+    for _ in range(repeat):
+        m = make_map()
+        start = time.perf_counter()
+        for i, key in enumerate(keys):
+            m.put(key, i)
+        best["put"] = max(best["put"], len(keys) / (time.perf_counter() - start))
+
+        get = m.get
+        start = time.perf_counter()
+        for key in lookups:
+            get(key)
+        best["get"] = max(best["get"], len(lookups) / (time.perf_counter() - start))
+
+        if hasattr(m, "get_many"):
+            start = time.perf_counter()
+            m.get_many(lookups)
+            best["get_many"] = max(best["get_many"], len(lookups) / (time.perf_counter() - start))
+
+    return {
+        "map": name,
+        "memory_bytes_per_entry": memory / len(keys),
+        "ops_per_sec": best,
+    }
+
+
+def command_typed(args) -> int:
+    """
+    Compares IntHashMap and BytesHashMap with the generic open addressing and separate
+    chaining maps holding the same int or bytes keys and int values.
+    """
+    rng = random.Random(args.seed)
+    ints = rng.sample(range(2 ** 40), 2 * args.size)
+    int_keys, int_misses = ints[:args.size], ints[args.size:]
+    bytes_keys = [b"key" + str(i).encode() for i in int_keys]
+    bytes_misses = [b"key" + str(i).encode() for i in int_misses]
+
+    cases = (
+        ("int", "IntHashMap", IntHashMap, int_keys, int_misses),
+        ("int", "oa", lambda: OAHashMap(11, hash), int_keys, int_misses),
+        ("int", "sc", lambda: SCHashMap(11, hash), int_keys, int_misses),
+        ("bytes", "BytesHashMap", BytesHashMap, bytes_keys, bytes_misses),
+        ("bytes", "oa", lambda: OAHashMap(11, hash), bytes_keys, bytes_misses),
+        ("bytes", "sc", lambda: SCHashMap(11, hash), bytes_keys, bytes_misses),
+    )
+
+    results = []
+    for key_type, name, make_map, keys, misses in cases:
+        result = typed_case(name, make_map, keys, misses, args.repeat)
+        result["keys"] = key_type
+        result["size"] = args.size
+        results.append(result)
+
+    print(json.dumps({"results": results}, indent=2))
+    return 0
+
+
+def command_multimap(args) -> int:
+    """
+    Groups records by key with MultiHashMap.add, and with get and put of a list value on a
+    plain separate chaining map, and reports records per second and hash calls per record.
+    """
+    rng = random.Random(args.seed)
+    records = [("group" + str(rng.randrange(args.groups)), i) for i in range(args.records)]
+
+    def get_then_put(m):
+        for key, value in records:
+            values = m.get(key)
+            if values is None:
+                m.put(key, [value])
+            else:
+                values.append(value)
+                m.put(key, values)
+
+    def add(m):
+        for key, value in records:
+            m.add(key, value)
+
+    results = []
+    for name, map_class, group in (("get_then_put", SCHashMap, get_then_put),
+                                   ("add", MultiHashMap, add)):
+        best = 0
+        for _ in range(args.repeat):
+            m = map_class(11, crc32_hash)
+            start = time.perf_counter()
+            group(m)
+            best = max(best, len(records) / (time.perf_counter() - start))
+
+        # Count hash calls on a separate instrumented run, since instrumentation slows it down.
+        m = map_class(11, crc32_hash)
+        metrics = HashMapMetrics()
+        m.enable_instrumentation(metrics)
+        group(m)
+
+        results.append({
+            "method": name,
+            "records": args.records,
+            "groups": m.get_size(),
+            "records_per_sec": best,
+            "hash_calls_per_record": metrics.hash_calls / len(records),
+        })
+    results[1]["speedup"] = results[1]["records_per_sec"] / results[0]["records_per_sec"]
+
+    print(json.dumps({"results": results}, indent=2))
+    return 0
+
+
+def command_join(args) -> int:
+    """
+    Times an inner join of two maps streamed through join, intersection, and the loop they
+    replace, which goes over the larger map's get_keys_and_values calling contains_key and get
+    on the other. The second map is --ratio times the size of the first, and --overlap of the
+    first map's keys are in both.
+    """
+    results = []
+    for impl, size in itertools.product(args.impl, args.size):
+        map_class = IMPLEMENTATIONS[impl]
+        shared = int(size * args.overlap)
+        other = max(shared, int(size * args.ratio))
+        pairs1 = [("key" + str(i), i) for i in range(size)]
+        pairs2 = [("key" + str(i), -i) for i in range(size - shared, size - shared + other)]
+        m1 = bulk_build(pairs1, map_class, crc32_hash, workers=1)
+        m2 = bulk_build(pairs2, map_class, crc32_hash, workers=1)
+        del pairs1, pairs2
+
+        def naive():
+            rows = 0
+            for key, value in m2.get_keys_and_values():
+                if m1.contains_key(key):
+                    m1.get(key)
+                    rows += 1
+            return rows
+
+        def streamed():
+            rows = 0
+            for _ in m1.join(m2, "inner", stream=True):
+                rows += 1
+            return rows
+
+        def intersect():
+            return m1.intersection(m2).get_size()
+
+        seconds = {}
+        for name, function in (("naive_loop", naive), ("join_stream", streamed),
+                               ("intersection", intersect)):
+            best = None
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                rows = function()
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            seconds[name] = best
+
+        results.append({
+            "impl": impl,
+            "size": size,
+            "other_size": m2.get_size(),
+            "rows": rows,
+            "seconds": seconds,
+            "join_speedup": seconds["naive_loop"] / seconds["join_stream"],
+        })
+        del m1, m2
+
+    print(json.dumps({"results": results}, indent=2))
+    return 0
+
+
+def directory_bytes(directory: str) -> int:
+    """
+    Returns the total size of the files in a directory.
+    """
+    return sum(entry.stat().st_size for entry in os.scandir(directory) if entry.is_file())
+
+
+def command_external(args) -> int:
+    """
+    Loads an ExternalHashMap in batches, flushes it, and times single and batched lookups.
+    Only pool_size of the segments are in memory at once, so with the defaults the data is
+    ten times what the map keeps resident.
+    """
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory(dir=args.directory) as directory:
+        m = ExternalHashMap(directory, args.segments, args.pool_size, crc32_hash)
+
+        start = time.perf_counter()
+        for first in range(0, args.size, args.batch):
+            last = min(first + args.batch, args.size)
+            m.put_many(("key" + str(i), i) for i in range(first, last))
+        load = time.perf_counter() - start
+
+        start = time.perf_counter()
+        m.flush()
+        flush = time.perf_counter() - start
+
+        keys = ["key" + str(rng.randrange(args.size)) for _ in range(args.ops)]
+        start = time.perf_counter()
+        for key in keys:
+            m.get(key)
+        get = time.perf_counter() - start
+
+        start = time.perf_counter()
+        m.get_many(keys)
+        get_many = time.perf_counter() - start
+
+        result = {
+            "size": m.get_size(),
+            "segments": args.segments,
+            "pool_size": args.pool_size,
+            "resident_fraction": args.pool_size / args.segments,
+            "disk_bytes": directory_bytes(directory),
+            "max_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+            "put_many_per_sec": args.size / load,
+            "flush_seconds": flush,
+            "get_per_sec": args.ops / get,
+            "get_many_per_sec": args.ops / get_many,
+        }
+        m.close()
+
+    print(json.dumps({"results": [result]}, indent=2))
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """
+    Returns the command-line parser with one subcommand per benchmark.
+    """
+    parser = argparse.ArgumentParser(description="Hash map benchmarks and load tests.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="sweep workloads, sizes and load factors")
+    run.add_argument("--impl", nargs="+", choices=sorted(IMPLEMENTATIONS), default=["sc", "oa"])
+    run.add_argument("--workload", nargs="+", choices=WORKLOADS, default=list(WORKLOADS))
+    run.add_argument("--size", nargs="+", type=int, default=[1000, 10000])
+    run.add_argument("--load-factor", nargs="+", type=float, default=[.25, .5],
+                     help="starting load factor, which sets the initial capacity")
+    run.add_argument("--ops", type=int, default=0, help="operations per case (default: size)")
+    run.add_argument("--hash", choices=sorted(HASH_FUNCTIONS), default="crc32")
+    run.add_argument("--seed", type=int, default=0)
+    run.add_argument("--repeat", type=int, default=3, help="timed runs per case, fastest is kept")
+    run.add_argument("--output", help="write the JSON report here instead of stdout")
+    run.add_argument("--baseline", help="JSON report to compare against")
+    run.add_argument("--tolerance", type=float, default=.1,
+                     help="allowed fractional slowdown before a case counts as a regression")
+    run.set_defaults(handler=command_run)
+
+    instrumentation = commands.add_parser("instrumentation",
+                                          help="put/get throughput with instrumentation off and on")
+    instrumentation.add_argument("--impl", nargs="+", choices=sorted(IMPLEMENTATIONS),
+                                 default=["sc", "oa"])
+    instrumentation.add_argument("--size", type=int, default=100000)
+    instrumentation.add_argument("--repeat", type=int, default=5)
+    instrumentation.add_argument("--hash", choices=sorted(HASH_FUNCTIONS), default="crc32")
+    instrumentation.set_defaults(handler=command_instrumentation)
+
+    bloom = commands.add_parser("bloom", help="miss-heavy get throughput with a Bloom filter")
+    bloom.add_argument("--impl", nargs="+", choices=sorted(IMPLEMENTATIONS), default=["sc", "oa"])
+    bloom.add_argument("--size", type=int, default=100000)
+    bloom.add_argument("--ops", type=int, default=100000)
+    bloom.add_argument("--hit-ratio", type=float, default=.1,
+                       help="fraction of lookups for keys that are in the map")
+    bloom.add_argument("--bits-per-key", type=int, default=10)
+    bloom.add_argument("--hash", nargs="+", choices=sorted(HASH_FUNCTIONS),
+                       default=["crc32", "hash_function_2"])
+    bloom.add_argument("--seed", type=int, default=0)
+    bloom.add_argument("--repeat", type=int, default=3)
+    bloom.set_defaults(handler=command_bloom)
+
+    primes = commands.add_parser("primes", help="prime capacity lookup, construction and resize")
+    primes.add_argument("--impl", nargs="+", choices=sorted(IMPLEMENTATIONS), default=["sc", "oa"])
+    primes.add_argument("--capacity", nargs="+", type=int, default=[100000, 1000000])
+    primes.add_argument("--max-capacity", type=int, default=10 ** 9,
+                        help="largest capacity for the prime lookup timings")
+    primes.add_argument("--repeat", type=int, default=3)
+    primes.set_defaults(handler=command_primes)
+
+    clear = commands.add_parser("clear", help="create, clear and refill cycles")
+    clear.add_argument("--impl", nargs="+", choices=sorted(IMPLEMENTATIONS), default=["sc", "oa"])
+    clear.add_argument("--capacity", nargs="+", type=int, default=[100, 10000, 1000000])
+    clear.add_argument("--fill", type=int, default=16, help="keys put and read back per cycle")
+    clear.add_argument("--cycles", type=int, default=1000)
+    clear.add_argument("--repeat", type=int, default=3)
+    clear.set_defaults(handler=command_clear)
+
+    typed = commands.add_parser("typed", help="typed maps against the generic maps")
+    typed.add_argument("--size", type=int, default=100000)
+    typed.add_argument("--seed", type=int, default=0)
+    typed.add_argument("--repeat", type=int, default=3)
+    typed.set_defaults(handler=command_typed)
+
+    multimap = commands.add_parser("multimap", help="group-by with MultiHashMap against get/put")
+    multimap.add_argument("--records", type=int, default=200000)
+    multimap.add_argument("--groups", type=int, default=1000)
+    multimap.add_argument("--seed", type=int, default=0)
+    multimap.add_argument("--repeat", type=int, default=3)
+    multimap.set_defaults(handler=command_multimap)
+
+    join = commands.add_parser("join", help="hash join and intersection of two maps")
+    join.add_argument("--impl", nargs="+", choices=sorted(IMPLEMENTATIONS), default=["sc", "oa"])
+    join.add_argument("--size", nargs="+", type=int, default=[100000, 1000000],
+                      help="entries in the first map; 10000000 needs several GB of memory")
+    join.add_argument("--ratio", type=float, default=10,
+                      help="size of the second map relative to the first")
+    join.add_argument("--overlap", type=float, default=.5,
+                      help="fraction of the first map's keys also in the second")
+    join.add_argument("--repeat", type=int, default=1)
+    join.set_defaults(handler=command_join)
+
+    external = commands.add_parser("external", help="disk-backed map with a bounded buffer pool")
+    external.add_argument("--size", type=int, default=1000000)
+    external.add_argument("--segments", type=int, default=100)
+    external.add_argument("--pool-size", type=int, default=10,
+                          help="segments kept in memory; segments / pool-size is the data to "
+                               "memory ratio")
+    external.add_argument("--batch", type=int, default=100000, help="pairs per put_many call")
+    external.add_argument("--ops", type=int, default=10000, help="random lookups to time")
+    external.add_argument("--directory", help="parent of the temporary segment directory")
+    external.add_argument("--seed", type=int, default=0)
+    external.set_defaults(handler=command_external)
+
+    return parser
+
+
+def main(argv: list = None) -> int:
+    """
+    Parses the command line and runs the chosen benchmark. Returns the exit status.
+    """
+    args = build_parser().parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,210 @@
+# Description: This file contains a BloomFilter and BloomHashMap, a wrapper that puts a Bloom filter in
+# front of a HashMap from hash_map_sc or hash_map_oa. Most lookups for keys that are not in the map
+# are answered by the filter, without hashing the key with the map's hash function or walking a
+# chain or probe sequence. put adds keys to the filter. The filter is rebuilt when the map resizes,
+# since it is sized for the keys the map can hold before its next resize. It is also rebuilt after
+# enough removals, since removed keys stay in the filter and raise its false positive rate.
+
+import math
+
+from a6_include import DynamicArray
+
+
+class BloomFilter:
+    def __init__(self, expected_keys: int, bits_per_key: int = 10) -> None:
+        """
+        Initialize an empty filter sized for expected_keys keys. With the default of 10 bits
+        per key, about 1% of lookups for absent keys are false positives once it is full.
+        """
+        if bits_per_key < 1:
+            raise ValueError("bits_per_key must be at least 1")
+
+        self._bits = max(64, expected_keys * bits_per_key)
+        self._hashes = max(1, round(bits_per_key * math.log(2)))
+        self._array = bytearray((self._bits + 7) // 8)
+        self._count = 0
+
+    def add(self, key: str) -> None:
+        """
+        Adds a key to the filter.
+        """
+        # Double hashing: the i-th bit position is h1 + i * h2, from one 64-bit hash.
+        h = hash(key)
+        h1 = h & 0xFFFFFFFF
+        h2 = (h >> 32) | 1
+        bits = self._bits
+        array = self._array
+        for i in range(self._hashes):
+            position = (h1 + i * h2) % bits
+            array[position >> 3] |= 1 << (position & 7)
+        self._count += 1
+
+    def might_contain(self, key: str) -> bool:
+        """
+        Returns False if the key was definitely never added, otherwise True.
+        """
+        h = hash(key)
+        h1 = h & 0xFFFFFFFF
+        h2 = (h >> 32) | 1
+        bits = self._bits
+        array = self._array
+        for i in range(self._hashes):
+            position = (h1 + i * h2) % bits
+            if not array[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+    def get_count(self) -> int:
+        """
+        Returns the number of keys added to the filter.
+        """
+        return self._count
+
+    def memory_bytes(self) -> int:
+        """
+        Returns the size of the filter's bit array in bytes.
+        """
+        return len(self._array)
+
+
+class BloomHashMap:
+    def __init__(self, hash_map, bits_per_key: int = 10, rebuild_ratio: float = .5) -> None:
+        """
+        Wraps an existing hash_map_sc or hash_map_oa HashMap, building a filter from the keys
+        already in it. The filter is rebuilt once the keys removed since the last build reach
+        rebuild_ratio times the keys in the filter.
+        """
+        self._map = hash_map
+        self._bits_per_key = bits_per_key
+        self._rebuild_ratio = rebuild_ratio
+        self.rebuild()
+
+    def rebuild(self) -> None:
+        """
+        Replaces the filter with a new one holding exactly the keys in the map, sized for the
+        number of keys the map can hold before it next grows.
+        """
+        expected = max(self._map.get_size(), int(self._map.get_capacity() * self._map.MAX_LOAD))
+        self._filter = BloomFilter(expected, self._bits_per_key)
+        for key, _ in self._map.get_keys_and_values():
+            self._filter.add(key)
+        self._removals = 0
+
+    def get_filter(self) -> BloomFilter:
+        """
+        Returns the current filter.
+        """
+        return self._filter
+
+    def get_size(self) -> int:
+        """
+        Return size of map
+        """
+        return self._map.get_size()
+
+    def get_capacity(self) -> int:
+        """
+        Return capacity of map
+        """
+        return self._map.get_capacity()
+
+    def table_load(self) -> float:
+        """
+        Returns the current load factor of the hash table.
+        """
+        return self._map.table_load()
+
+    def empty_buckets(self) -> int:
+        """
+        Returns number of empty buckets.
+        """
+        return self._map.empty_buckets()
+
+    # ------------------------------------------------------------------ #
+
+    def put(self, key: str, value: object) -> None:
+        """
+        Puts a key-value pair into the map and adds the key to the filter, or rebuilds the
+        filter if the put made the map resize.
+        """
+        capacity = self._map.get_capacity()
+        self._map.put(key, value)
+        if self._map.get_capacity() != capacity:
+            self.rebuild()
+        else:
+            self._filter.add(key)
+
+    def get(self, key: str) -> object:
+        """
+        Returns a key's value, or None if the key is not in the map.
+        """
+        if not self._filter.might_contain(key):
+            return None
+        return self._map.get(key)
+
+    def contains_key(self, key: str) -> bool:
+        """
+        Returns True if the key is in the map, otherwise False.
+        """
+        if not self._filter.might_contain(key):
+            return False
+        return self._map.contains_key(key)
+
+    def remove(self, key: str) -> None:
+        """
+        Removes a key from the map. The key stays in the filter until the next rebuild.
+        """
+        if not self._filter.might_contain(key):
+            return
+        size = self._map.get_size()
+        self._map.remove(key)
+        if self._map.get_size() != size:
+            self._removals += 1
+            if self._removals >= self._rebuild_ratio * max(1, self._filter.get_count()):
+                self.rebuild()
+
+    def resize_table(self, new_capacity: int, workers: int = None) -> None:
+        """
+        Resizes the map, in workers processes if given, and rebuilds the filter for its new
+        capacity.
+        """
+        self._map.resize_table(new_capacity, workers)
+        self.rebuild()
+
+    def clear(self) -> None:
+        """
+        Clears the map and the filter.
+        """
+        self._map.clear()
+        self.rebuild()
+
+    def get_keys_and_values(self) -> DynamicArray:
+        """
+        Returns a new array containing all the key, value pairs.
+        """
+        return self._map.get_keys_and_values()
+
+
+# ------------------- BASIC TESTING ---------------------------------------- #
+
+if __name__ == "__main__":
+
+    from a6_include import hash_function_1
+    from hash_map_oa import HashMap as OAHashMap
+    from hash_map_sc import HashMap as SCHashMap
+
+    print("\nBloom filter example 1")
+    print("----------------------")
+    for map_class in (SCHashMap, OAHashMap):
+        m = BloomHashMap(map_class(11, hash_function_1))
+        for i in range(300):
+            m.put('key' + str(i), i)
+        for i in range(0, 300, 2):
+            m.remove('key' + str(i))
+        result = m.get_size() == 150
+        for i in range(300):
+            result &= m.get('key' + str(i)) == (i if i % 2 else None)
+            result &= not m.contains_key('absent' + str(i))
+        m.resize_table(1000)
+        result &= m.get('key299') == 299 and m.get('key298') is None
+        print(map_class.__module__, result, m.get_size(), m.get_capacity(), m.get_filter().get_count())
@@ -0,0 +1,72 @@
+# Description: This file contains BucketArray, the bucket storage used by the HashMap classes in
+# hash_map_sc and hash_map_oa. It stands in for the DynamicArray of buckets those classes used to
+# fill up front. Nothing is allocated until the first write, so building a map of any capacity
+# is O(1), and a separate chaining bucket's linked list is only created when the bucket is first
+# used. Every slot is stamped with the generation it was written in, and clear() starts a new
+# generation, so clearing is O(1) as well: slots from an older generation read as empty and
+# are overwritten when used again.
+
+from a6_include import DynamicArrayException
+
+
+class BucketArray:
+    def __init__(self, capacity: int, factory=None) -> None:
+        """
+        Initialize an array of capacity empty buckets. An empty bucket reads as None, or, if a
+        factory is given, as a new bucket from factory() that is stored on first read.
+        """
+        self._capacity = capacity
+        self._factory = factory
+        self._generation = 0
+
+        # Buckets and the generation each was written in, allocated by the first write.
+        self._buckets = None
+        self._stamps = None
+
+    def __getitem__(self, index: int) -> object:
+        """
+        Returns the bucket at index, creating it if the array has a factory.
+        """
+        if not 0 <= index < self._capacity:
+            raise DynamicArrayException
+        if self._buckets is not None and self._stamps[index] == self._generation:
+            return self._buckets[index]
+        if self._factory is None:
+            return None
+        bucket = self._factory()
+        self[index] = bucket
+        return bucket
+
+    def __setitem__(self, index: int, bucket: object) -> None:
+        """
+        Stores a bucket at index.
+        """
+        if not 0 <= index < self._capacity:
+            raise DynamicArrayException
+        if self._buckets is None:
+            self._buckets = [None] * self._capacity
+            # -1 is older than any generation, so unwritten slots read as empty.
+            self._stamps = [-1] * self._capacity
+        self._buckets[index] = bucket
+        self._stamps[index] = self._generation
+
+    def get(self, index: int) -> object:
+        """
+        Returns the bucket at index, or None if it is empty, without creating one.
+        """
+        if self._buckets is not None and self._stamps[index] == self._generation:
+            return self._buckets[index]
+        return None
+
+    def length(self) -> int:
+        """
+        Returns the number of buckets.
+        """
+        return self._capacity
+
+    def clear(self) -> None:
+        """
+        Empties every bucket in O(1) by starting a new generation. Buckets from older
+        generations stay in memory until their index is written again.
+        """
+        self._generation += 1
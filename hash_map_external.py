@@ -0,0 +1,309 @@
+# Description: This file contains ExternalHashMap, a disk-backed hash map for key sets larger than
+# memory. Keys are partitioned by hash into a fixed number of segments, as in a Grace hash join, and
+# each segment is a HashMap from hash_map_sc or hash_map_oa that is stored in its own file. Only a
+# bounded pool of recently used segments is kept in memory. When the pool is full, the least recently
+# used segment is evicted, and written out first if it was changed. A segment file is always written
+# in one sequential pass to a temporary file that then replaces the old one. put_many and get_many
+# group a batch of keys by segment, so each segment is loaded at most once per batch.
+
+import os
+import pickle
+from collections import OrderedDict
+
+from a6_include import DynamicArray
+from hash_map_hashing import crc32_hash
+from hash_map_oa import HashMap as OAHashMap
+from hash_map_parallel import bulk_build
+
+# File holding the number of segments and the number of keys in each.
+_META = "meta.pickle"
+
+
+class ExternalHashMap:
+    def __init__(self, directory: str, segments: int = 64, pool_size: int = 8,
+                 function: callable = crc32_hash, map_class=OAHashMap) -> None:
+        """
+        Initialize a map stored in directory, split into segments files, with at most pool_size
+        segments in memory at a time. Each segment should fit in memory comfortably. A directory
+        written by an earlier map is opened with its existing keys, and must use the same number
+        of segments and hash function. The hash function must return the same value in every run,
+        which rules out Python's built-in hash, and spread keys well, since each segment is a
+        hash map of its own.
+        """
+        if segments < 1 or pool_size < 1:
+            raise ValueError("segments and pool_size must be at least 1")
+
+        self._directory = directory
+        self._segments = segments
+        self._pool_size = pool_size
+        self._hash_function = function
+        self._map_class = map_class
+
+        # Loaded segments by number, least recently used first, and the ones changed since loading.
+        self._pool = OrderedDict()
+        self._dirty = set()
+
+        os.makedirs(directory, exist_ok=True)
+        self._sizes = [0] * segments
+        meta = os.path.join(directory, _META)
+        if os.path.exists(meta):
+            with open(meta, "rb") as f:
+                sizes = pickle.load(f)
+            if len(sizes) != segments:
+                raise ValueError(f"{directory} holds {len(sizes)} segments, not {segments}")
+            self._sizes = sizes
+
+        # A segment file is replaced before the sizes are, so after a crash in between, a
+        # segment recorded as empty may have a file. Count those keys from the file.
+        for segment in range(segments):
+            if not self._sizes[segment] and os.path.exists(self._path(segment)):
+                self._sizes[segment] = len(self._read_pairs(segment))
+
+        # Number of keys in each segment's file, which is what the sizes file records. Changed
+        # segments in the pool can hold more or fewer until they are written.
+        self._stored_sizes = list(self._sizes)
+
+    def __enter__(self) -> "ExternalHashMap":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def get_size(self) -> int:
+        """
+        Return size of map
+        """
+        return sum(self._sizes)
+
+    def get_segment_count(self) -> int:
+        """
+        Returns the number of segments.
+        """
+        return self._segments
+
+    def get_resident_segments(self) -> int:
+        """
+        Returns the number of segments currently loaded in memory.
+        """
+        return len(self._pool)
+
+    # ------------------------------------------------------------------ #
+
+    def _segment_of(self, key: str) -> int:
+        """
+        Returns the number of the segment a key belongs to.
+        """
+        return self._hash_function(key) % self._segments
+
+    def _path(self, segment: int) -> str:
+        """
+        Returns the path of a segment's file.
+        """
+        return os.path.join(self._directory, f"segment{segment:05d}.pickle")
+
+    def _read_pairs(self, segment: int) -> list:
+        """
+        Returns the key, value pairs stored in a segment's file, without loading it into the pool.
+        """
+        # Whether a segment has data is decided by its file, so a stale size can never cause
+        # the file to be overwritten with only the keys put since.
+        path = self._path(segment)
+        if not os.path.exists(path):
+            return []
+        with open(path, "rb") as f:
+            return pickle.load(f)
+
+    def _write(self, segment: int) -> None:
+        """
+        Writes a loaded segment to its file in one sequential pass, followed by the segment
+        sizes, so that a segment written out on eviction is found again after a reopen.
+        """
+        hash_map = self._pool[segment]
+        pairs = [pair for pair in hash_map.iter_keys_and_values()]
+        path = self._path(segment)
+        with open(path + ".tmp", "wb") as f:
+            pickle.dump(pairs, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(path + ".tmp", path)
+        self._dirty.discard(segment)
+        self._stored_sizes[segment] = len(pairs)
+        self._write_sizes()
+
+    def _write_sizes(self) -> None:
+        """
+        Writes the number of keys in each segment's file.
+        """
+        path = os.path.join(self._directory, _META)
+        with open(path + ".tmp", "wb") as f:
+            pickle.dump(self._stored_sizes, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(path + ".tmp", path)
+
+    def _load(self, segment: int):
+        """
+        Returns a segment's map, loading it into the pool and evicting the least recently used
+        segment if the pool is full.
+        """
+        hash_map = self._pool.get(segment)
+        if hash_map is not None:
+            self._pool.move_to_end(segment)
+            return hash_map
+
+        if len(self._pool) >= self._pool_size:
+            oldest = next(iter(self._pool))
+            if oldest in self._dirty:
+                self._write(oldest)
+            del self._pool[oldest]
+
+        hash_map = bulk_build(self._read_pairs(segment), self._map_class, self._hash_function,
+                              workers=1)
+        self._pool[segment] = hash_map
+        return hash_map
+
+    # ------------------------------------------------------------------ #
+
+    def put(self, key: str, value: object) -> None:
+        """
+        Puts a key-value pair into the map.
+        """
+        segment = self._segment_of(key)
+        hash_map = self._load(segment)
+        hash_map.put(key, value)
+        self._sizes[segment] = hash_map.get_size()
+        self._dirty.add(segment)
+
+    def get(self, key: str) -> object:
+        """
+        Returns a key's value, or None if the key is not in the map.
+        """
+        segment = self._segment_of(key)
+        if not self._sizes[segment]:
+            return None
+        return self._load(segment).get(key)
+
+    def contains_key(self, key: str) -> bool:
+        """
+        Returns True if the key is in the map, otherwise False.
+        """
+        segment = self._segment_of(key)
+        if not self._sizes[segment]:
+            return False
+        return self._load(segment).contains_key(key)
+
+    def remove(self, key: str) -> None:
+        """
+        Removes a key from the map.
+        """
+        segment = self._segment_of(key)
+        if not self._sizes[segment]:
+            return
+        hash_map = self._load(segment)
+        hash_map.remove(key)
+        if hash_map.get_size() != self._sizes[segment]:
+            self._sizes[segment] = hash_map.get_size()
+            self._dirty.add(segment)
+
+    def put_many(self, pairs) -> None:
+        """
+        Puts every (key, value) pair from an iterable. The pairs are grouped by segment first,
+        so each segment is loaded once. Later pairs win for repeated keys.
+        """
+        groups = {}
+        for key, value in pairs:
+            groups.setdefault(self._segment_of(key), []).append((key, value))
+
+        for segment, group in groups.items():
+            hash_map = self._load(segment)
+            for key, value in group:
+                hash_map.put(key, value)
+            self._sizes[segment] = hash_map.get_size()
+            self._dirty.add(segment)
+
+    def get_many(self, keys) -> DynamicArray:
+        """
+        Returns a new array with the value of each key (None for missing keys), in the order
+        of keys. The keys are grouped by segment first, so each segment is loaded once.
+        """
+        keys = list(keys)
+        values = [None] * len(keys)
+        groups = {}
+        for i, key in enumerate(keys):
+            groups.setdefault(self._segment_of(key), []).append(i)
+
+        for segment, positions in groups.items():
+            if not self._sizes[segment]:
+                continue
+            get = self._load(segment).get
+            for i in positions:
+                values[i] = get(keys[i])
+        return DynamicArray(values)
+
+    def iter_keys_and_values(self):
+        """
+        Yields every key, value pair, one segment at a time. Segments that are not in the pool
+        are read from disk without being loaded into it.
+        """
+        for segment in range(self._segments):
+            hash_map = self._pool.get(segment)
+            if hash_map is not None:
+                yield from hash_map.iter_keys_and_values()
+            else:
+                yield from self._read_pairs(segment)
+
+    def get_keys_and_values(self) -> DynamicArray:
+        """
+        Returns a new array containing all the key, value pairs. This holds every pair in
+        memory at once, so use iter_keys_and_values for maps larger than memory.
+        """
+        new_arr = DynamicArray()
+        for pair in self.iter_keys_and_values():
+            new_arr.append(pair)
+        return new_arr
+
+    def flush(self) -> None:
+        """
+        Writes every changed segment in the pool to disk, along with the segment sizes.
+        """
+        for segment in sorted(self._dirty):
+            self._write(segment)
+        self._write_sizes()
+
+    def close(self) -> None:
+        """
+        Flushes the map and empties the pool.
+        """
+        self.flush()
+        self._pool.clear()
+
+    def clear(self) -> None:
+        """
+        Removes every key, deleting the segment files.
+        """
+        self._pool.clear()
+        self._dirty.clear()
+        for segment in range(self._segments):
+            if os.path.exists(self._path(segment)):
+                os.remove(self._path(segment))
+        self._sizes = [0] * self._segments
+        self._stored_sizes = [0] * self._segments
+        self.flush()
+
+
+# ------------------- BASIC TESTING ---------------------------------------- #
+
+if __name__ == "__main__":
+
+    import tempfile
+
+    print("\nreopen without close example 1")
+    print("------------------------------")
+    with tempfile.TemporaryDirectory() as directory:
+        m = ExternalHashMap(directory, segments=16, pool_size=2)
+        for i in range(1000):
+            m.put('key' + str(i), i)
+        # Only the segments still in the pool hold changes that were never written.
+        unwritten = sum(m._pool[segment].get_size() - m._stored_sizes[segment] for segment in m._dirty)
+        reopened = ExternalHashMap(directory, segments=16, pool_size=2)
+        found = sum(reopened.get('key' + str(i)) == i for i in range(1000))
+        print(reopened.get_size(), found, found + unwritten == 1000)
+        m.close()
+        reopened = ExternalHashMap(directory, segments=16, pool_size=2)
+        print(reopened.get_size(), reopened.get('key999'))
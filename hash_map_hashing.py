@@ -0,0 +1,14 @@
+# Description: This file contains crc32_hash, a deterministic, well-spread hash function for the hash
+# maps. hash_function_1 and hash_function_2 from a6_include only produce a few thousand distinct
+# values for keys like 'key123456', and Python's built-in hash is salted per process for strings.
+# crc32_hash returns the same value in every process and every run, so it suits the worker processes
+# of hash_map_parallel and the segment files of hash_map_external, which must still match on reopen.
+
+import zlib
+
+
+def crc32_hash(key: str) -> int:
+    """
+    Returns the CRC-32 checksum of the key's UTF-8 bytes.
+    """
+    return zlib.crc32(key.encode())
@@ -0,0 +1,110 @@
+# Description: This file contains HashMapMetrics, the metrics sink used by the optional instrumentation
+# of the HashMap classes in hash_map_sc and hash_map_oa. HashMap.enable_instrumentation(metrics)
+# installs counting versions of the map's hot-path methods on that one map, and
+# disable_instrumentation removes them again. A map that is not instrumented runs exactly the
+# same code as before, so instrumentation that is off costs nothing.
+#
+# Recorded: buckets probed (open addressing) or chain nodes visited (separate chaining) per operation,
+# resize events with their duration, tombstones reused by put, and time spent in the hash function.
+
+import time
+
+
+class HashMapMetrics:
+    def __init__(self, callback=None) -> None:
+        """
+        Initialize empty counters. If callback is given, it is called as callback(event, data)
+        for every recorded event, where event is 'operation', 'resize', 'tombstone_reuse' or
+        'hash', and data is a dict with the event's details.
+        """
+        self.callback = callback
+        self.reset()
+
+    def reset(self) -> None:
+        """
+        Sets every counter back to zero.
+        """
+        # Per operation name: number of calls, total probes and the longest probe run.
+        self.operations = {}
+        self.probes = {}
+        self.max_probes = {}
+
+        # (old capacity, new capacity, seconds) for every resize.
+        self.resizes = []
+
+        self.tombstone_reuses = 0
+        self.hash_calls = 0
+        self.hash_seconds = 0.0
+
+    def record_operation(self, operation: str, probes: int) -> None:
+        """
+        Records one put, get, contains_key or remove and the number of buckets or nodes it probed.
+        """
+        self.operations[operation] = self.operations.get(operation, 0) + 1
+        self.probes[operation] = self.probes.get(operation, 0) + probes
+        if probes > self.max_probes.get(operation, 0):
+            self.max_probes[operation] = probes
+        if self.callback is not None:
+            self.callback("operation", {"operation": operation, "probes": probes})
+
+    def record_resize(self, old_capacity: int, new_capacity: int, seconds: float) -> None:
+        """
+        Records a resize event and how long it took.
+        """
+        self.resizes.append((old_capacity, new_capacity, seconds))
+        if self.callback is not None:
+            self.callback("resize", {"old_capacity": old_capacity, "new_capacity": new_capacity,
+                                     "seconds": seconds})
+
+    def record_tombstone_reuse(self) -> None:
+        """
+        Records a put that stored its key in a tombstone's bucket.
+        """
+        self.tombstone_reuses += 1
+        if self.callback is not None:
+            self.callback("tombstone_reuse", {})
+
+    def record_hash(self, seconds: float) -> None:
+        """
+        Records one call to the hash function and how long it took.
+        """
+        self.hash_calls += 1
+        self.hash_seconds += seconds
+        if self.callback is not None:
+            self.callback("hash", {"seconds": seconds})
+
+    def report(self) -> dict:
+        """
+        Returns a summary of every counter as a dict.
+        """
+        return {
+            "operations": {
+                operation: {
+                    "count": count,
+                    "mean_probes": self.probes[operation] / count,
+                    "max_probes": self.max_probes.get(operation, 0),
+                }
+                for operation, count in self.operations.items()
+            },
+            "resizes": {
+                "count": len(self.resizes),
+                "seconds": sum(seconds for _, _, seconds in self.resizes),
+                "events": [{"old_capacity": old, "new_capacity": new, "seconds": seconds}
+                           for old, new, seconds in self.resizes],
+            },
+            "tombstone_reuses": self.tombstone_reuses,
+            "hash": {
+                "calls": self.hash_calls,
+                "seconds": self.hash_seconds,
+            },
+        }
+
+
+def timed(function, metrics: HashMapMetrics, key: str) -> int:
+    """
+    Calls function(key), records how long it took as a hash call and returns the result.
+    """
+    start = time.perf_counter()
+    value = function(key)
+    metrics.record_hash(time.perf_counter() - start)
+    return value
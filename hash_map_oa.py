@@ -7,24 +7,47 @@
 # handle collisions. This means that it will quadratically probe the array until it finds an empty index.
 # It contains methods such as put, table_load, empty_buckets, resize_table, get, contains_key,
 # remove, clear, get_keys_and_values, as well as an iterators __iter__ and __next__.
+# snapshot returns a read-only HashMapSnapshot that shares buckets with the map copy-on-write,
+# and clone returns an independent copy of the map. enable_instrumentation records probes, resizes,
+# tombstone reuse and hash function time into a HashMapMetrics from hash_map_metrics.
+# Prime capacities come from the precomputed growth schedule in hash_map_primes. Buckets live in a
+# BucketArray from hash_map_buckets, so construction and clear are O(1).
+# intersection, union, difference and join come from hash_map_ops. resize_table with a number of
+# workers rebuilds the table in worker processes through hash_map_parallel.
+
+import time
+import types
+import weakref
 
 from a6_include import (DynamicArray, DynamicArrayException, HashEntry,
                         hash_function_1, hash_function_2)
+import hash_map_ops
+import hash_map_parallel
+from hash_map_buckets import BucketArray
+from hash_map_metrics import HashMapMetrics, timed
+from hash_map_primes import is_prime, next_prime
 
 
 class HashMap:
+    # Load factor at which put grows the table.
+    MAX_LOAD = .5
+
+    # Live snapshots sharing this map's buckets, replaced by a WeakSet on the first snapshot.
+    _snapshots = ()
+
+    # Number of tombstones in the buckets, cleared out by resize_table.
+    _tombstones = 0
+
     def __init__(self, capacity: int, function) -> None:
         """
         Initialize new HashMap that uses
         quadratic probing for collision resolution
-        DO NOT CHANGE THIS METHOD IN ANY WAY
         """
-        self._buckets = DynamicArray()
-
         # capacity must be a prime number
         self._capacity = self._next_prime(capacity)
-        for _ in range(self._capacity):
-            self._buckets.append(None)
+
+        # Every bucket starts out as None without being written.
+        self._buckets = BucketArray(self._capacity)
 
         self._hash_function = function
         self._size = 0
@@ -42,35 +65,16 @@ class HashMap:
     def _next_prime(self, capacity: int) -> int:
         """
         Increment from given number to find the closest prime number
-        DO NOT CHANGE THIS METHOD IN ANY WAY
         """
-        if capacity % 2 == 0:
-            capacity += 1
-
-        while not self._is_prime(capacity):
-            capacity += 2
-
-        return capacity
+        # Growth steps come straight from the precomputed schedule in hash_map_primes.
+        return next_prime(capacity)
 
     @staticmethod
     def _is_prime(capacity: int) -> bool:
         """
         Determine if given integer is a prime number and return boolean
-        DO NOT CHANGE THIS METHOD IN ANY WAY
         """
-        if capacity == 2 or capacity == 3:
-            return True
-
-        if capacity == 1 or capacity % 2 == 0:
-            return False
-
-        factor = 3
-        while factor ** 2 <= capacity:
-            if capacity % factor == 0:
-                return False
-            factor += 2
-
-        return True
+        return is_prime(capacity)
 
     def get_size(self) -> int:
         """
@@ -92,44 +96,64 @@ class HashMap:
         Puts values into a hashmap given a specified key. If a node is already at
         the calculated index, this method will quadratically probe until it finds an
         empty one. Lastly, entries are entered in self._buckets as a HashEntry object.
+        A new key takes the first tombstone it passed on the way, if there was one.
         """
-        # Check table load and resize if necessary
-        if self.table_load() >= .5:
-            self.resize_table(self._capacity * 2)
+        # Check table load and tombstones, and resize if necessary
+        new_capacity = self._rehash_capacity()
+        if new_capacity:
+            self.resize_table(new_capacity)
 
         # Calculate the index and save the initial index
         index = self._hash_function(key) % self._capacity
         initial_index = index
 
-        # If the index is empty, simply place the HashEntry at that index.
-        if self._buckets[index] is None:
-            self._buckets[index] = HashEntry(key, value)
-            self._size += 1
-            return
-
+        tombstone = None
         probe = 1
         # As long as the bucket at this index isn't empty
         while self._buckets[index]:
-            # We check if the keys match
-            if self._buckets[index].key == key:
-                # If the value is a tombstone, we can just overwrite it.
-                if self._buckets[index].is_tombstone is True:
-                    self._buckets[index] = HashEntry(key, value)
-                    self._size += 1
-                    return
-                else:
-                    # Otherwise, just swap the values.
-                    self._buckets[index].value = value
-                    return
+            node = self._buckets[index]
+            # Remember the first tombstone, but keep probing in case the key is further along.
+            if node.is_tombstone:
+                if tombstone is None:
+                    tombstone = index
+            # If the keys match, just swap the values.
+            elif node.key == key:
+                if self._snapshots:
+                    self._copy_on_write(index)
+                node.value = value
+                return
             # Calculate the next index and increment probe number.
             index = (initial_index + probe**2) % self._capacity
             probe += 1
 
-        # Once broken out of the loop, it means we found an empty index,
-        # set the bucket equal to the new HashEntry and increase the size.
+        # Once broken out of the loop, the key is not in the table. Reuse the first
+        # tombstone we passed if there was one, otherwise use the empty index we found.
+        if tombstone is not None:
+            index = tombstone
+            self._tombstones -= 1
+        if self._snapshots:
+            self._copy_on_write(index)
         self._buckets[index] = HashEntry(key, value)
         self._size += 1
 
+    def _rehash_capacity(self, incoming: int = 0) -> int:
+        """
+        Returns the capacity put would rehash the table to before storing a key, or 0 if it
+        would not rehash. incoming counts keys still to be added on top of the current ones, as
+        during a cooperative resize in hash_map_async.
+        """
+        size = self._size + incoming
+        if size / self._capacity >= self.MAX_LOAD:
+            return self._capacity * 2
+        # Tombstones use up buckets on the probe sequences until the next resize, so once they
+        # and the live entries reach the load limit together, rehash. Stay at the same capacity
+        # only if that frees at least half the limit, or the rehash would soon be repeated.
+        if (size + self._tombstones) / self._capacity >= self.MAX_LOAD:
+            if size * 2 / self._capacity >= self.MAX_LOAD:
+                return self._capacity * 2
+            return self._capacity
+        return 0
+
     def table_load(self) -> float:
         """
         Returns the current load factor of the hash table.
@@ -142,15 +166,19 @@ class HashMap:
         """
         return self.get_capacity() - self.get_size()
 
-    def resize_table(self, new_capacity: int) -> None:
+    def resize_table(self, new_capacity: int, workers: int = None) -> None:
         """
         Resizes table as necessary given a new_capacity. New capacity can be smaller than
         current size, in which case, resize table utilizes the put function so that it can resize
-        as necessary.
+        as necessary. With workers, the table is rebuilt by hash_map_parallel.parallel_resize in
+        that many processes instead.
         """
         # New capacity cannot be less than or equal to current size.
         if new_capacity <= self._size:
             return
+        if workers is not None:
+            hash_map_parallel.parallel_resize(self, new_capacity, workers)
+            return
         # New capacity also has to be prime.
         if not self._is_prime(new_capacity):
             new_capacity = self._next_prime(new_capacity)
@@ -166,52 +194,73 @@ class HashMap:
         # Iterate through all the buckets, checking if each bucket is not empty.
         for i in range(self._capacity):
             node = self._buckets[i]
-            if node:
-                # If not None, put its key and value in the new hash map.
+            if node and not node.is_tombstone:
+                # If not None or a tombstone, put its key and value in the new hash map.
                 new_hash.put(node.key, node.value)
 
         # Update the capacity and buckets to the new hash map.
-        self._capacity = new_hash.get_capacity()
-        self._buckets = new_hash._buckets
+        self._adopt(new_hash)
+
+    def _find_index(self, key: str):
+        """
+        Returns the index of the live entry for a key, or None if the key is not present.
+        Follows the same quadratic probe sequence as put, stopping at the first empty bucket.
+        """
+        index = self._hash_function(key) % self._capacity
+        initial_index = index
+
+        probe = 1
+        # A key can only sit on its own probe sequence, and put never skips an empty bucket,
+        # so reaching one means the key is absent. The probe limit guards a table with no empty buckets.
+        while self._buckets[index] and probe <= self._capacity:
+            node = self._buckets[index]
+            if node.key == key and not node.is_tombstone:
+                return index
+            index = (initial_index + probe**2) % self._capacity
+            probe += 1
+        return None
 
     def get(self, key: str) -> object:
         """
         Returns a key's value given a key. Returns None if no matches are found.
         """
-        for i in range(self._capacity):
-            if self._buckets[i] and self._buckets[i].key == key and not self._buckets[i].is_tombstone:
-                return self._buckets.get_at_index(i).value
-        return None
+        index = self._find_index(key)
+        if index is None:
+            return None
+        return self._buckets[index].value
 
     def contains_key(self, key: str) -> bool:
         """
         Returns True if a key is found in the hash table, otherwise False.
         """
-        for i in range(self._capacity):
-            if self._buckets[i] and self._buckets[i].key == key and not self._buckets[i].is_tombstone:
-                return True
-        return False
+        return self._find_index(key) is not None
 
     def remove(self, key: str) -> None:
         """
         Removes a node given a key. In this method, the node.is_tombstone is switched to True,
         effectively making it an empty bucket.
-        Uses the iterator created below to iterate through each bucket in the array, and
-        compares the specified key to each node's.
+        Probes for the key the same way get does, so only the key's probe sequence is visited.
         """
-        # Get the index and bucket at that index.
-        for node in self:
-            if node.key == key:
-                node.is_tombstone = True
-                self._size -= 1
+        index = self._find_index(key)
+        if index is not None:
+            if self._snapshots:
+                self._copy_on_write(index)
+            self._buckets[index].is_tombstone = True
+            self._size -= 1
+            self._tombstones += 1
 
     def clear(self) -> None:
         """
         Clears hash table and sets size to 0.
         """
-        for i in range(self.get_capacity()):
-            self._buckets[i] = None
+        # Live snapshots keep reading the current buckets, so give the map new ones instead.
+        if self._release_snapshots():
+            self._buckets = BucketArray(self._capacity)
+        # Start a new generation, which empties every bucket at once.
+        else:
+            self._buckets.clear()
         self._size = 0
+        self._tombstones = 0
 
     def get_keys_and_values(self) -> DynamicArray:
         """
@@ -228,6 +277,150 @@ class HashMap:
             i += 1
         return new_arr
 
+    def iter_keys_and_values(self):
+        """
+        Yields every key, value pair without building an array first. The map must not
+        change until the iteration is done.
+        """
+        for i in range(self._capacity):
+            node = self._buckets.get(i)
+            if node and not node.is_tombstone:
+                yield node.key, node.value
+
+    def intersection(self, other) -> "HashMap":
+        """
+        Returns a new map of the keys in both maps, with their values from this one.
+        """
+        return hash_map_ops.intersection(self, other)
+
+    def union(self, other) -> "HashMap":
+        """
+        Returns a new map of the keys in either map. Keys in both keep their value from this one.
+        """
+        return hash_map_ops.union(self, other)
+
+    def difference(self, other) -> "HashMap":
+        """
+        Returns a new map of the keys in this map that are not in other.
+        """
+        return hash_map_ops.difference(self, other)
+
+    def join(self, other, how: str = "inner", stream: bool = False):
+        """
+        Joins this map with other into (key, v1, v2) rows, as hash_map_ops.join does.
+        """
+        return hash_map_ops.join(self, other, how, stream)
+
+    def _place(self, index: int, key: str, value: object) -> None:
+        """
+        Stores a key known not to be in the map at the first empty bucket of the probe sequence
+        starting at index, skipping the lookup and load check done by put.
+        Used by the bulk loader in hash_map_parallel.
+        """
+        slot = index
+        probe = 1
+        while self._buckets[slot] is not None:
+            slot = (index + probe**2) % self._capacity
+            probe += 1
+        self._buckets[slot] = HashEntry(key, value)
+        self._size += 1
+
+    def get_bucket_keys_and_values(self, index: int) -> DynamicArray:
+        """
+        Returns a new array containing the key, value pair stored in a single bucket,
+        or an empty array if the bucket is empty or holds a tombstone.
+        """
+        new_arr = DynamicArray()
+        node = self._buckets[index]
+        if node and not node.is_tombstone:
+            new_arr.append((node.key, node.value))
+        return new_arr
+
+    def snapshot(self) -> "HashMapSnapshot":
+        """
+        Returns a read-only view of the map as it is right now, in O(1). The view shares the
+        map's buckets, and the map only copies a bucket for its snapshots before changing it.
+        """
+        if not self._snapshots:
+            self._snapshots = weakref.WeakSet()
+        snapshot = HashMapSnapshot(self)
+        self._snapshots.add(snapshot)
+        return snapshot
+
+    def clone(self) -> "HashMap":
+        """
+        Returns an independent copy of the map. Every bucket is copied the same way copy-on-write
+        copies it, so no key is hashed or put again.
+        """
+        new_hash = HashMap(self._capacity, self._hash_function)
+        new_hash._capacity = self._capacity
+        for i in range(self._capacity):
+            new_hash._buckets[i] = self._copy_bucket(self._buckets[i])
+        new_hash._size = self._size
+        new_hash._tombstones = self._tombstones
+        return new_hash
+
+    @staticmethod
+    def _copy_bucket(node: HashEntry) -> HashEntry:
+        """
+        Returns a new HashEntry with the same key, value and tombstone flag, or None for an
+        empty bucket.
+        """
+        if node is None:
+            return None
+        new_node = HashEntry(node.key, node.value)
+        new_node.is_tombstone = node.is_tombstone
+        return new_node
+
+    def _copy_on_write(self, index: int) -> None:
+        """
+        Gives every live snapshot that still reads the bucket at index from the map its own
+        copy, before the map changes that bucket.
+        """
+        copy = None
+        for snapshot in self._snapshots:
+            if index not in snapshot._saved:
+                if copy is None:
+                    copy = self._copy_bucket(self._buckets[index])
+                snapshot._saved[index] = copy
+
+    def _adopt(self, new_hash: "HashMap") -> None:
+        """
+        Takes over the buckets of another map, which is how a resize finishes.
+        """
+        # Live snapshots keep the old buckets, which are no longer changed.
+        self._release_snapshots()
+        self._capacity = new_hash.get_capacity()
+        self._buckets = new_hash._buckets
+        self._size = new_hash.get_size()
+        self._tombstones = new_hash._tombstones
+
+    def _release_snapshots(self) -> bool:
+        """
+        Stops tracking live snapshots before the map replaces its buckets wholesale. The snapshots
+        keep the old buckets, which the map no longer changes. Returns True if there were any.
+        """
+        released = bool(self._snapshots)
+        self._snapshots = ()
+        return released
+
+    def enable_instrumentation(self, metrics: HashMapMetrics) -> None:
+        """
+        Starts recording probes, resizes, tombstone reuse and hash function time into metrics. Until this is
+        called, or after disable_instrumentation, the map runs its plain methods at no extra cost.
+        """
+        self._metrics = metrics
+        for name in _InstrumentedHashMap.METHODS:
+            setattr(self, name, types.MethodType(getattr(_InstrumentedHashMap, name), self))
+
+    def disable_instrumentation(self) -> None:
+        """
+        Stops recording and switches the map back to its plain methods.
+        """
+        for name in _InstrumentedHashMap.METHODS:
+            self.__dict__.pop(name, None)
+        self.__dict__.pop('_metrics', None)
+
     def __iter__(self):
         """
         Creates iterator for loop
@@ -249,6 +442,199 @@ class HashMap:
         return value
 
 
+class _InstrumentedHashMap:
+    """
+    Counting versions of the hot-path methods. This class is never instantiated:
+    enable_instrumentation binds its methods to a single map, so only instrumented maps run them.
+    They behave exactly like the plain methods and additionally record into self._metrics.
+    """
+
+    METHODS = ("_find_index", "put", "get", "contains_key", "remove", "resize_table")
+
+    def _find_index(self, key: str, operation: str = "lookup"):
+        """
+        Returns the index of the live entry for a key, or None if the key is not present,
+        recording the buckets probed under operation.
+        """
+        index = timed(self._hash_function, self._metrics, key) % self._capacity
+        initial_index = index
+
+        probe = 1
+        found = None
+        while self._buckets[index] and probe <= self._capacity:
+            node = self._buckets[index]
+            if node.key == key and not node.is_tombstone:
+                found = index
+                break
+            index = (initial_index + probe**2) % self._capacity
+            probe += 1
+        self._metrics.record_operation(operation, probe)
+        return found
+
+    def put(self, key: str, value: object) -> None:
+        """
+        Puts values into a hashmap given a specified key.
+        """
+        new_capacity = self._rehash_capacity()
+        if new_capacity:
+            self.resize_table(new_capacity)
+
+        index = timed(self._hash_function, self._metrics, key) % self._capacity
+        initial_index = index
+
+        tombstone = None
+        probe = 1
+        while self._buckets[index]:
+            node = self._buckets[index]
+            if node.is_tombstone:
+                if tombstone is None:
+                    tombstone = index
+            elif node.key == key:
+                if self._snapshots:
+                    self._copy_on_write(index)
+                node.value = value
+                self._metrics.record_operation("put", probe)
+                return
+            index = (initial_index + probe**2) % self._capacity
+            probe += 1
+        self._metrics.record_operation("put", probe)
+
+        if tombstone is not None:
+            index = tombstone
+            self._tombstones -= 1
+            self._metrics.record_tombstone_reuse()
+        if self._snapshots:
+            self._copy_on_write(index)
+        self._buckets[index] = HashEntry(key, value)
+        self._size += 1
+
+    def get(self, key: str) -> object:
+        """
+        Returns a key's value given a key. Returns None if no matches are found.
+        """
+        index = self._find_index(key, "get")
+        if index is None:
+            return None
+        return self._buckets[index].value
+
+    def contains_key(self, key: str) -> bool:
+        """
+        Returns True if a key is found in the hash table, otherwise False.
+        """
+        return self._find_index(key, "contains_key") is not None
+
+    def remove(self, key: str) -> None:
+        """
+        Removes a node given a key by turning it into a tombstone.
+        """
+        index = self._find_index(key, "remove")
+        if index is not None:
+            if self._snapshots:
+                self._copy_on_write(index)
+            self._buckets[index].is_tombstone = True
+            self._size -= 1
+            self._tombstones += 1
+
+    def resize_table(self, new_capacity: int, workers: int = None) -> None:
+        """
+        Resizes the table, recording the event and its duration if it happened.
+        """
+        old_capacity = self._capacity
+        old_buckets = self._buckets
+        start = time.perf_counter()
+        type(self).resize_table(self, new_capacity, workers)
+        if self._buckets is not old_buckets:
+            self._metrics.record_resize(old_capacity, self._capacity, time.perf_counter() - start)
+
+
+class HashMapSnapshot:
+    def __init__(self, hash_map: HashMap) -> None:
+        """
+        Initialize a read-only view of hash_map as it is right now.
+        Use HashMap.snapshot() rather than creating one directly.
+        """
+        self._buckets = hash_map._buckets
+        self._capacity = hash_map._capacity
+        self._size = hash_map._size
+        self._hash_function = hash_map._hash_function
+
+        # Copies of the buckets the map changed after this snapshot was taken, by index.
+        # A saved bucket can be None, so membership is what counts.
+        self._saved = {}
+
+    def get_size(self) -> int:
+        """
+        Return size of the map when the snapshot was taken
+        """
+        return self._size
+
+    def get_capacity(self) -> int:
+        """
+        Return capacity of the map when the snapshot was taken
+        """
+        return self._capacity
+
+    def table_load(self) -> float:
+        """
+        Returns the load factor of the map when the snapshot was taken.
+        """
+        return self._size / self._capacity
+
+    def _bucket(self, index: int) -> HashEntry:
+        """
+        Returns the bucket at index as it was when the snapshot was taken.
+        """
+        if index in self._saved:
+            return self._saved[index]
+        return self._buckets[index]
+
+    def get(self, key: str) -> object:
+        """
+        Returns a key's value given a key. Returns None if no matches are found.
+        Probes the same way HashMap.get does.
+        """
+        index = self._hash_function(key) % self._capacity
+        initial_index = index
+
+        probe = 1
+        node = self._bucket(index)
+        while node and probe <= self._capacity:
+            if node.key == key and not node.is_tombstone:
+                return node.value
+            index = (initial_index + probe**2) % self._capacity
+            probe += 1
+            node = self._bucket(index)
+        return None
+
+    def contains_key(self, key: str) -> bool:
+        """
+        Returns True if a key is found in the snapshot, otherwise False.
+        """
+        index = self._hash_function(key) % self._capacity
+        initial_index = index
+
+        probe = 1
+        node = self._bucket(index)
+        while node and probe <= self._capacity:
+            if node.key == key and not node.is_tombstone:
+                return True
+            index = (initial_index + probe**2) % self._capacity
+            probe += 1
+            node = self._bucket(index)
+        return False
+
+    def get_keys_and_values(self) -> DynamicArray:
+        """
+        Returns a new DynamicArray object that contains all the snapshot's key-value pairs.
+        """
+        new_arr = DynamicArray()
+        for i in range(self._capacity):
+            node = self._bucket(i)
+            if node and not node.is_tombstone:
+                new_arr.append((node.key, node.value))
+        return new_arr
+
+
 # ------------------- BASIC TESTING ---------------------------------------- #
 
 if __name__ == "__main__":
@@ -457,3 +843,17 @@ if __name__ == "__main__":
     print(m)
     for item in m:
         print('K:', item.key, 'V:', item.value)
+
+    print("\nsnapshot and clone example 1")
+    print("----------------------------")
+    m = HashMap(11, hash_function_1)
+    for i in range(5):
+        m.put(str(i), i * 10)
+    snapshot = m.snapshot()
+    copy = m.clone()
+    m.put('0', 'changed')
+    m.remove('1')
+    m.put('9', 90)
+    print(snapshot.get_keys_and_values())
+    print(m.get_keys_and_values())
+    print(copy.get_size(), copy.get('0'), copy.contains_key('9'))
@@ -0,0 +1,186 @@
+# Description: This file contains set algebra and hash join operators between two HashMap objects
+# from hash_map_sc or hash_map_oa: intersection, union, difference and join. Each one walks the
+# smaller map where the result allows it and looks its keys up in the larger one, so the cost
+# grows with the smaller map. The maps also offer these as methods. join yields (key, v1, v2)
+# tuples for inner, left, right and outer joins, either collected into a DynamicArray or streamed
+# from a generator. Result maps have the first map's class and hash function.
+
+from a6_include import DynamicArray
+
+JOINS = ("inner", "left", "right", "outer")
+
+# Stands in for a missing key, since None is a valid value.
+_MISSING = object()
+
+
+def _lookup(hash_map):
+    """
+    Returns a function that looks a key up in hash_map and returns its value, or _MISSING.
+    """
+    get = hash_map.get
+    contains_key = hash_map.contains_key
+
+    def lookup(key):
+        value = get(key)
+        # get returns None both for missing keys and for keys whose value is None.
+        if value is None and not contains_key(key):
+            return _MISSING
+        return value
+
+    return lookup
+
+
+def _new_map(hash_map, size: int):
+    """
+    Returns an empty map of the same class and hash function as hash_map, with room for size
+    keys before it has to grow. Results are filled with put, which stores a value as get
+    returned it for every map class, including the value lists of a MultiHashMap.
+    """
+    return type(hash_map)(int(size / hash_map.MAX_LOAD) + 1, hash_map._hash_function)
+
+
+def intersection(map1, map2):
+    """
+    Returns a new map of the keys in both maps, with their values from map1.
+    """
+    result = _new_map(map1, min(map1.get_size(), map2.get_size()))
+    if map1.get_size() <= map2.get_size():
+        in_map2 = map2.contains_key
+        for key, value in map1.iter_keys_and_values():
+            if in_map2(key):
+                result.put(key, value)
+    else:
+        lookup = _lookup(map1)
+        for key, _ in map2.iter_keys_and_values():
+            value = lookup(key)
+            if value is not _MISSING:
+                result.put(key, value)
+    return result
+
+
+def union(map1, map2):
+    """
+    Returns a new map of the keys in either map. Keys in both keep their value from map1.
+    """
+    result = _new_map(map1, map1.get_size() + map2.get_size())
+    for key, value in map2.iter_keys_and_values():
+        result.put(key, value)
+    for key, value in map1.iter_keys_and_values():
+        result.put(key, value)
+    return result
+
+
+def difference(map1, map2):
+    """
+    Returns a new map of the keys in map1 that are not in map2, with their values.
+    """
+    if map1.get_size() <= map2.get_size():
+        result = _new_map(map1, map1.get_size())
+        in_map2 = map2.contains_key
+        for key, value in map1.iter_keys_and_values():
+            if not in_map2(key):
+                result.put(key, value)
+        return result
+
+    # map2 is the smaller one, so copy map1 and remove map2's keys from the copy.
+    result = map1.clone()
+    for key, _ in map2.iter_keys_and_values():
+        result.remove(key)
+    return result
+
+
+def _join_rows(map1, map2, how: str):
+    """
+    Yields the (key, v1, v2) rows of a join, as described in join.
+    """
+    if how == "inner":
+        if map1.get_size() <= map2.get_size():
+            lookup = _lookup(map2)
+            for key, value in map1.iter_keys_and_values():
+                other = lookup(key)
+                if other is not _MISSING:
+                    yield key, value, other
+        else:
+            lookup = _lookup(map1)
+            for key, value in map2.iter_keys_and_values():
+                other = lookup(key)
+                if other is not _MISSING:
+                    yield key, other, value
+        return
+
+    if how == "right":
+        lookup = _lookup(map1)
+        for key, value in map2.iter_keys_and_values():
+            other = lookup(key)
+            yield key, None if other is _MISSING else other, value
+        return
+
+    # Left and outer joins both keep every key of map1.
+    lookup = _lookup(map2)
+    for key, value in map1.iter_keys_and_values():
+        other = lookup(key)
+        yield key, value, None if other is _MISSING else other
+
+    if how == "outer":
+        in_map1 = map1.contains_key
+        for key, value in map2.iter_keys_and_values():
+            if not in_map1(key):
+                yield key, None, value
+
+
+def join(map1, map2, how: str = "inner", stream: bool = False):
+    """
+    Joins two maps into (key, v1, v2) rows, where v1 and v2 are the key's values in map1 and
+    map2, and None for a map the key is missing from. An inner join keeps the keys in both
+    maps, a left or right join every key of map1 or map2, and an outer join every key.
+    Returns a new DynamicArray of the rows, or, if stream is True, a generator that produces
+    them one at a time. Neither map may change while a streamed join is being read.
+    """
+    if how not in JOINS:
+        raise ValueError("how must be one of " + ", ".join(JOINS))
+
+    rows = _join_rows(map1, map2, how)
+    if stream:
+        return rows
+
+    new_arr = DynamicArray()
+    for row in rows:
+        new_arr.append(row)
+    return new_arr
+
+
+# ------------------- BASIC TESTING ---------------------------------------- #
+
+if __name__ == "__main__":
+
+    from a6_include import hash_function_1
+    from hash_map_oa import HashMap as OAHashMap
+    from hash_map_sc import MultiHashMap
+
+    print("\nset algebra example 1")
+    print("---------------------")
+    m1 = OAHashMap(11, hash_function_1)
+    m2 = OAHashMap(11, hash_function_1)
+    for i in range(6):
+        m1.put(str(i), i)
+    for i in range(3, 9):
+        m2.put(str(i), i * 10)
+    for result in (intersection(m1, m2), union(m1, m2), difference(m1, m2)):
+        print(result.get_size(), [result.get(str(i)) for i in range(9)])
+    print(join(m1, m2, "inner"))
+
+    print("\nset algebra example 2 - MultiHashMap operands")
+    print("---------------------------------------------")
+    m1 = MultiHashMap(11, hash_function_1)
+    m2 = MultiHashMap(11, hash_function_1)
+    m1.add('a', 1)
+    m1.add('a', 2)
+    m1.add('b', 3)
+    m2.add('a', 4)
+    m2.add('c', 5)
+    for result in (intersection(m1, m2), union(m1, m2), difference(m1, m2)):
+        print(type(result).__name__, [list(result.get_all(key)) for key in "abc"])
+    result = union(m1, m2)
+    result.add('a', 6)
+    print(list(result.get_all('a')), list(m1.get_all('a')))
+    print(join(m1, m2, "outer"))
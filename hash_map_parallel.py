@@ -0,0 +1,214 @@
+# Description: This file contains a parallel bulk loader for the HashMap classes in hash_map_sc and
+# hash_map_oa. bulk_build hashes its input across a pool of worker processes, splitting it into
+# partitions of bucket indices. A second round of workers turns each partition into finished bucket
+# contents. For separate chaining the workers build the finished chains, which the table takes as
+# they are. For open addressing the keys are placed in their slots one at a time, without calling
+# put for every key. The table is sized from the number of distinct keys.
+# parallel_resize rebuilds an existing map at a new capacity with the same engine, which pays off for
+# very large tables, and resize_table on either map uses it when given a number of workers. The hash function is called in the worker processes, so it must be a picklable
+# module-level function that returns the same value in every process, like hash_function_1,
+# hash_function_2 and crc32_hash from hash_map_hashing. Python's built-in hash is salted per process
+# for strings and is not safe here.
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from a6_include import hash_function_2
+
+
+def _hash_chunk(pairs: list, function, capacity: int, partitions: int) -> list:
+    """
+    Worker step one: hashes a chunk of (key, value) pairs and splits them by partition.
+    Returns one list of (index, key, value) triples per partition, in input order.
+    """
+    span = -(-capacity // partitions)
+    out = [[] for _ in range(partitions)]
+    for key, value in pairs:
+        index = function(key) % capacity
+        out[index // span].append((index, key, value))
+    return out
+
+
+# Longest chain a worker sends back as a finished linked list. Pickling a linked list recurses once
+# per node, so longer chains are sent as pairs and linked in the parent process instead.
+_MAX_SENT_CHAIN = 100
+
+
+def _build_partition(hashed: list, map_class, max_chain: int = None) -> list:
+    """
+    Worker step two: groups the triples of one partition, taken from every chunk in input order,
+    by bucket index. When a key appears more than once, the later value wins, just as with
+    repeated puts. Returns a list of (index, bucket, count) for every non-empty bucket, where
+    count is the number of keys. If map_class builds whole buckets, as separate chaining does,
+    bucket is the finished chain, unless it is longer than max_chain. Otherwise it is a list
+    of pairs.
+    """
+    buckets = {}
+    for triples in hashed:
+        for index, key, value in triples:
+            bucket = buckets.get(index)
+            if bucket is None:
+                bucket = buckets[index] = {}
+            bucket[key] = value
+
+    make_bucket = getattr(map_class, "_make_bucket", None)
+    out = []
+    for index, bucket in buckets.items():
+        pairs = list(bucket.items())
+        if make_bucket is not None and (max_chain is None or len(pairs) <= max_chain):
+            out.append((index, make_bucket(pairs), len(pairs)))
+        else:
+            out.append((index, pairs, len(pairs)))
+    return out
+
+
+def _build_buckets(pairs: list, map_class, function, capacity: int, workers: int):
+    """
+    Runs both worker steps and yields (index, bucket, count) for every non-empty bucket of a
+    table with the given capacity. A single worker runs everything in this process.
+    """
+    partitions = workers * 4
+    size = -(-len(pairs) // partitions) or 1
+    chunks = [pairs[i:i + size] for i in range(0, len(pairs), size)]
+
+    if workers == 1:
+        hashed = [_hash_chunk(chunk, function, capacity, partitions) for chunk in chunks]
+        for p in range(partitions):
+            yield from _build_partition([out[p] for out in hashed], map_class)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        hashed = list(pool.map(_hash_chunk, chunks, [function] * len(chunks),
+                               [capacity] * len(chunks), [partitions] * len(chunks)))
+        groups = [[out[p] for out in hashed] for p in range(partitions)]
+        del hashed
+        for buckets in pool.map(_build_partition, groups, [map_class] * partitions,
+                                [_MAX_SENT_CHAIN] * partitions):
+            yield from buckets
+
+
+def _fill(hash_map, buckets) -> None:
+    """
+    Writes finished bucket contents into an empty map. A separate chaining map takes each chain
+    whole. In an open addressing map, the slot a key ends up in depends on the keys that probed
+    before it anywhere in the table, so keys are placed one at a time through the map's own
+    placement step, which skips the lookup and load check that put does.
+    """
+    place_bucket = getattr(hash_map, "_place_bucket", None)
+    if place_bucket is None:
+        place = hash_map._place
+        for index, pairs, _ in buckets:
+            for key, value in pairs:
+                place(index, key, value)
+        return
+
+    for index, bucket, count in buckets:
+        # Chains too long to send back from a worker arrive as pairs.
+        if isinstance(bucket, list):
+            bucket = hash_map._make_bucket(bucket)
+        place_bucket(index, bucket, count)
+
+
+def _build(pairs: list, map_class, function, capacity: int, workers: int):
+    """
+    Builds a new map_class HashMap from a list of (key, value) pairs with distinct keys, as
+    bulk_build describes.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers < 1:
+        raise ValueError("workers must be at least 1")
+
+    needed = int(len(pairs) / map_class.MAX_LOAD) + 1
+    if capacity is None or capacity < needed:
+        capacity = needed
+
+    hash_map = map_class(capacity, function)
+    _fill(hash_map, _build_buckets(pairs, map_class, function, hash_map.get_capacity(), workers))
+    return hash_map
+
+
+def bulk_build(pairs, map_class, function, capacity: int = None, workers: int = None):
+    """
+    Builds a new map_class HashMap from an iterable of (key, value) pairs using a pool of
+    worker processes. If no capacity is given, or it is too small to hold the distinct keys at
+    the map's load limit, the smallest capacity that does is used. workers defaults to the
+    number of CPUs.
+    """
+    # Size the table from the distinct keys. Later values win, just as with repeated puts.
+    pairs = list(dict(pairs).items())
+    return _build(pairs, map_class, function, capacity, workers)
+
+
+def parallel_resize(hash_map, new_capacity: int, workers: int = None) -> None:
+    """
+    Resizes a map the way resize_table does, but rebuilds the table with bulk_build. Capacities
+    below 1 are ignored, and capacities too small to hold the current keys at the map's load
+    limit are raised to the smallest one that does. resize_table(new_capacity, workers) on
+    either map calls this.
+    """
+    if new_capacity < 1:
+        return
+
+    # The keys of a map are already distinct.
+    pairs = [pair for pair in hash_map.get_keys_and_values()]
+    new_hash = _build(pairs, type(hash_map), hash_map._hash_function, new_capacity, workers)
+
+    # Update the capacity and buckets to the new hash map.
+    hash_map._adopt(new_hash)
+
+
+# ------------------- BASIC TESTING ---------------------------------------- #
+
+if __name__ == "__main__":
+
+    from hash_map_hashing import crc32_hash
+    from hash_map_oa import HashMap as OAHashMap
+    from hash_map_sc import HashMap as SCHashMap
+
+    print("\nBulk build correctness")
+    print("----------------------")
+    pairs = [(str(i % 300), i) for i in range(1000)]
+    for map_class in (SCHashMap, OAHashMap):
+        m = bulk_build(pairs, map_class, hash_function_2, workers=2)
+        result = m.get_size() == 300
+        for i in range(700, 1000):
+            result &= m.get(str(i % 300)) == i
+        parallel_resize(m, 5000, workers=2)
+        result &= m.get_size() == 300 and m.get('299') == 899 and not m.contains_key('300')
+        print(map_class.__module__, result, m.get_size(), m.get_capacity())
+
+    print("\nSizing from distinct keys and resize_table with workers")
+    print("-------------------------------------------------------")
+    pairs = [(str(i % 700), i) for i in range(3000)]
+    for map_class in (SCHashMap, OAHashMap):
+        m = bulk_build(pairs, map_class, hash_function_2, workers=2)
+        load = m.table_load()
+        m.resize_table(3000, workers=2)
+        result = m.get_size() == 700 and m.get('699') == 2799 and m.get('0') == 2800
+        print(map_class.__module__, round(load, 2), result, m.get_capacity())
+
+    print("\nBuild throughput by worker count")
+    print("--------------------------------")
+    size = 500000
+    pairs = [('key' + str(i), i) for i in range(size)]
+    cpus = os.cpu_count() or 1
+
+    for map_class in (SCHashMap, OAHashMap):
+        start = time.perf_counter()
+        m = map_class(11, crc32_hash)
+        for key, value in pairs:
+            m.put(key, value)
+        elapsed = time.perf_counter() - start
+        print(f"{map_class.__module__} put loop:  {size / elapsed:12,.0f} keys/s")
+
+        workers = 1
+        while True:
+            start = time.perf_counter()
+            bulk_build(pairs, map_class, crc32_hash, workers=workers)
+            elapsed = time.perf_counter() - start
+            print(f"{map_class.__module__} {workers} worker(s): {size / elapsed:10,.0f} keys/s")
+            if workers >= cpus:
+                break
+            workers = min(workers * 2, cpus)
@@ -0,0 +1,68 @@
+# Description: This file contains the prime capacity helpers shared by the HashMap classes in
+# hash_map_sc and hash_map_oa. PRIMES is a precomputed growth schedule starting at 2, where each prime
+# is the smallest prime at or above twice the one before. Since put grows a table by doubling its
+# capacity, and the default capacity of 11 is on the schedule, every growth step is a dictionary
+# lookup. Other capacities fall back to a deterministic Miller-Rabin test.
+
+# Smallest prime at or above twice the prime before it.
+PRIMES = (
+    2, 5, 11, 23, 47, 97, 197, 397, 797, 1597, 3203, 6421, 12853, 25717, 51437, 102877, 205759,
+    411527, 823117, 1646237, 3292489, 6584983, 13169977, 26339969, 52679969, 105359939, 210719881,
+    421439783, 842879579, 1685759167, 3371518343, 6743036717, 13486073473, 26972146961,
+    53944293929, 107888587883, 215777175787, 431554351609, 863108703229, 1726217406467,
+)
+
+# Answers for next_prime on the schedule: a scheduled prime maps to itself, and twice a
+# scheduled prime, which is what put asks for, maps to the next one.
+_NEXT = {p: p for p in PRIMES[1:]}
+_NEXT.update({2 * p: q for p, q in zip(PRIMES, PRIMES[1:])})
+
+# Trial divisors and Miller-Rabin witnesses. These witnesses make the test exact for every
+# n below 3.3 * 10**24.
+_WITNESSES = (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41)
+
+
+def is_prime(n: int) -> bool:
+    """
+    Determine if given integer is a prime number and return boolean
+    """
+    if n < 2:
+        return False
+    for p in _WITNESSES:
+        if n % p == 0:
+            return n == p
+
+    # Write n - 1 as d * 2**s with d odd.
+    d = n - 1
+    s = 0
+    while d % 2 == 0:
+        d //= 2
+        s += 1
+
+    for a in _WITNESSES:
+        x = pow(a, d, n)
+        if x == 1 or x == n - 1:
+            continue
+        for _ in range(s - 1):
+            x = x * x % n
+            if x == n - 1:
+                break
+        else:
+            return False
+    return True
+
+
+def next_prime(n: int) -> int:
+    """
+    Returns the smallest odd prime at or above n, so even numbers, including 2, start the
+    search at n + 1. This is the rule HashMap has always used for its capacity.
+    """
+    prime = _NEXT.get(n)
+    if prime is not None:
+        return prime
+
+    if n % 2 == 0:
+        n += 1
+    while not is_prime(n):
+        n += 2
+    return n
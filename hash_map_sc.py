@@ -8,27 +8,47 @@
 # put (to add new key-values to the HashMap), empty_buckets, table_load (which returns the current
 # load factor of the table, clear, resize_table (which modifies the capacity and rehashes the elements),
 # get, contains, remove, get_keys_and_values, and lastly, an external method in find_mode.
-
+# snapshot returns a read-only HashMapSnapshot that shares buckets with the map copy-on-write,
+# and clone returns an independent copy of the map. enable_instrumentation records probes, resizes and
+# hash function time into a HashMapMetrics from hash_map_metrics.
+# Prime capacities come from the precomputed growth schedule in hash_map_primes. Buckets live in a
+# BucketArray from hash_map_buckets, which creates each linked list on first use and clears in O(1).
+# MultiHashMap is a multi-map mode where each key holds a list of values, grown with add.
+# intersection, union, difference and join come from hash_map_ops. resize_table with a number of
+# workers rebuilds the table in worker processes through hash_map_parallel.
+
+import time
+import types
+import weakref
 
 from a6_include import (DynamicArray, LinkedList,
                         hash_function_1, hash_function_2)
+import hash_map_ops
+import hash_map_parallel
+from hash_map_buckets import BucketArray
+from hash_map_metrics import HashMapMetrics, timed
+from hash_map_primes import is_prime, next_prime
 
 
 class HashMap:
+    # Load factor at which put grows the table.
+    MAX_LOAD = 1.0
+
+    # Live snapshots sharing this map's buckets, replaced by a WeakSet on the first snapshot.
+    _snapshots = ()
+
     def __init__(self,
                  capacity: int = 11,
                  function: callable = hash_function_1) -> None:
         """
         Initialize new HashMap that uses
         separate chaining for collision resolution
-        DO NOT CHANGE THIS METHOD IN ANY WAY
         """
-        self._buckets = DynamicArray()
-
         # capacity must be a prime number
         self._capacity = self._next_prime(capacity)
-        for _ in range(self._capacity):
-            self._buckets.append(LinkedList())
+
+        # Each bucket's linked list is created the first time the bucket is used.
+        self._buckets = BucketArray(self._capacity, LinkedList)
 
         self._hash_function = function
         self._size = 0
@@ -46,35 +66,16 @@ class HashMap:
     def _next_prime(self, capacity: int) -> int:
         """
         Increment from given number and the find the closest prime number
-        DO NOT CHANGE THIS METHOD IN ANY WAY
         """
-        if capacity % 2 == 0:
-            capacity += 1
-
-        while not self._is_prime(capacity):
-            capacity += 2
-
-        return capacity
+        # Growth steps come straight from the precomputed schedule in hash_map_primes.
+        return next_prime(capacity)
 
     @staticmethod
     def _is_prime(capacity: int) -> bool:
         """
         Determine if given integer is a prime number and return boolean
-        DO NOT CHANGE THIS METHOD IN ANY WAY
         """
-        if capacity == 2 or capacity == 3:
-            return True
-
-        if capacity == 1 or capacity % 2 == 0:
-            return False
-
-        factor = 3
-        while factor ** 2 <= capacity:
-            if capacity % factor == 0:
-                return False
-            factor += 2
-
-        return True
+        return is_prime(capacity)
 
     def get_size(self) -> int:
         """
@@ -101,11 +102,13 @@ class HashMap:
         Puts values into a hashmap given a specified key.
         """
         # Check if load factor >= 1, if so resize table.
-        if self.table_load() >= 1.0:
+        if self.table_load() >= self.MAX_LOAD:
             self.resize_table(self._capacity * 2)
 
         # Get the index and respective bucket at that index
         index = self.get_index(key, self._hash_function)
+        if self._snapshots:
+            self._copy_on_write(index)
         bucket = self._buckets[index]
 
         # If bucket is empty, we can just insert the key, value pair
@@ -133,10 +136,21 @@ class HashMap:
         # Iterate through all buckets, and if their length == 0,
         # increment the counter.
         for i in range(self._capacity):
-            if self._buckets[i].length() == 0:
+            bucket = self._buckets.get(i)
+            if bucket is None or bucket.length() == 0:
                 empty += 1
         return empty
 
+    def _rehash_capacity(self, incoming: int = 0) -> int:
+        """
+        Returns the capacity put would resize the table to before storing a key, or 0 if it
+        would not resize. incoming counts keys still to be added on top of the current ones, as
+        during a cooperative resize in hash_map_async.
+        """
+        if (self._size + incoming) / self._capacity >= self.MAX_LOAD:
+            return self._capacity * 2
+        return 0
+
     def table_load(self) -> float:
         """
         Returns the current load factor of the hash table.
@@ -148,20 +162,27 @@ class HashMap:
         """
         Clears the hash table out.
         """
-        # Iterate through every bucket, initializing it to a new linked list.
-        for i in range(self.get_capacity()):
-            self._buckets[i] = LinkedList()
+        # Live snapshots keep reading the current buckets, so give the map new ones instead.
+        if self._release_snapshots():
+            self._buckets = BucketArray(self._capacity, LinkedList)
+        # Start a new generation, which empties every bucket at once.
+        else:
+            self._buckets.clear()
         self._size = 0
 
-    def resize_table(self, new_capacity: int) -> None:
+    def resize_table(self, new_capacity: int, workers: int = None) -> None:
         """
         Resizes the table based on a given new capacity. New capacity can be smaller than
         current size, in which case, resize table utilizes the put function so that it can resize
-        as necessary.
+        as necessary. With workers, the table is rebuilt by hash_map_parallel.parallel_resize in
+        that many processes instead, which raises capacities below the load limit.
         """
         # New capacity cannot be less than 1.
         if new_capacity < 1:
             return
+        if workers is not None:
+            hash_map_parallel.parallel_resize(self, new_capacity, workers)
+            return
         # New capacity also has to be prime.
         if not self._is_prime(new_capacity):
             new_capacity = self._next_prime(new_capacity)
@@ -176,35 +197,35 @@ class HashMap:
 
         # Iterate through all the buckets, checking if each bucket is not empty.
         for i in range(self._capacity):
-            if self._buckets[i].length() > 0:
+            bucket = self._buckets.get(i)
+            if bucket is not None and bucket.length() > 0:
                 # If not empty, iterate through each node in bucket
                 # and put its key and value in the new hash map.
-                for node in self._buckets[i]:
+                for node in bucket:
                     new_hash.put(node.key, node.value)
 
         # Update the capacity and buckets to the new hash map.
-        self._capacity = new_hash.get_capacity()
-        self._buckets = new_hash._buckets
+        self._adopt(new_hash)
 
     def get(self, key: str):
         """
         Gets a value from the hashmap.
         """
-        # Iterate through all the buckets and check if they contain the given key.
-        # If so, return that key's value.
-        for i in range(self._capacity):
-            if self._buckets[i].contains(key):
-                return self._buckets[i].contains(key).value
+        # Only the key's own bucket can contain it.
+        bucket = self._buckets.get(self.get_index(key, self._hash_function))
+        node = bucket.contains(key) if bucket is not None else None
+        if node:
+            return node.value
         return None
 
     def contains_key(self, key: str) -> bool:
         """
         Returns a bool depending on if a key is present in the hash map.
         """
-        # Iterate through all the buckets, checking if any of them contain the key.
-        for i in range(self._capacity):
-            if self._buckets[i].contains(key):
-                return True
+        # Only the key's own bucket can contain it.
+        bucket = self._buckets.get(self.get_index(key, self._hash_function))
+        if bucket is not None and bucket.contains(key):
+            return True
         return False
 
     def remove(self, key: str) -> None:
@@ -213,7 +234,9 @@ class HashMap:
         """
         # Get the index and bucket at that index.
         index = self.get_index(key, self._hash_function)
-        bucket = self._buckets[index]
+        if self._snapshots:
+            self._copy_on_write(index)
+        bucket = self._buckets.get(index)
 
         # Check if bucket is filled
         if bucket and bucket.length() != 0:
@@ -243,12 +266,448 @@ class HashMap:
 
         # Iterate through each bucket, appending any key, value pairs to the new array.
         while i < self._capacity:
-            curr_bucket = self._buckets[i]
-            for node in curr_bucket:
-                new_arr.append((node.key, node.value))
+            curr_bucket = self._buckets.get(i)
+            if curr_bucket is not None:
+                for node in curr_bucket:
+                    new_arr.append((node.key, node.value))
             i += 1
         return new_arr
 
+    def iter_keys_and_values(self):
+        """
+        Yields every key, value pair without building an array first. The map must not
+        change until the iteration is done.
+        """
+        for i in range(self._capacity):
+            bucket = self._buckets.get(i)
+            if bucket is not None:
+                for node in bucket:
+                    yield node.key, node.value
+
+    def intersection(self, other) -> "HashMap":
+        """
+        Returns a new map of the keys in both maps, with their values from this one.
+        """
+        return hash_map_ops.intersection(self, other)
+
+    def union(self, other) -> "HashMap":
+        """
+        Returns a new map of the keys in either map. Keys in both keep their value from this one.
+        """
+        return hash_map_ops.union(self, other)
+
+    def difference(self, other) -> "HashMap":
+        """
+        Returns a new map of the keys in this map that are not in other.
+        """
+        return hash_map_ops.difference(self, other)
+
+    def join(self, other, how: str = "inner", stream: bool = False):
+        """
+        Joins this map with other into (key, v1, v2) rows, as hash_map_ops.join does.
+        """
+        return hash_map_ops.join(self, other, how, stream)
+
+    def _place(self, index: int, key: str, value: object) -> None:
+        """
+        Inserts a key known not to be in the map into the bucket at index, skipping the
+        lookup and load check done by put. Used by the bulk loader in hash_map_parallel.
+        """
+        self._buckets[index].insert(key, value)
+        self._size += 1
+
+    @staticmethod
+    def _make_bucket(pairs: list) -> LinkedList:
+        """
+        Returns a new linked list holding key, value pairs with distinct keys, in the same order.
+        The bulk loader in hash_map_parallel builds whole chains with it in worker processes.
+        """
+        new_bucket = LinkedList()
+        for key, value in reversed(pairs):
+            new_bucket.insert(key, value)
+        return new_bucket
+
+    def _place_bucket(self, index: int, bucket: LinkedList, count: int) -> None:
+        """
+        Stores a chain from _make_bucket holding count keys not yet in the map as the empty
+        bucket at index.
+        """
+        self._buckets[index] = bucket
+        self._size += count
+
+    def get_bucket_keys_and_values(self, index: int) -> DynamicArray:
+        """
+        Returns a new array containing the key, value pairs stored in a single bucket.
+        """
+        new_arr = DynamicArray()
+        bucket = self._buckets.get(index)
+        if bucket is not None:
+            for node in bucket:
+                new_arr.append((node.key, node.value))
+        return new_arr
+
+    def snapshot(self) -> "HashMapSnapshot":
+        """
+        Returns a read-only view of the map as it is right now, in O(1). The view shares the
+        map's buckets, and the map only copies a bucket for its snapshots before changing it.
+        """
+        if not self._snapshots:
+            self._snapshots = weakref.WeakSet()
+        snapshot = HashMapSnapshot(self)
+        self._snapshots.add(snapshot)
+        return snapshot
+
+    def clone(self) -> "HashMap":
+        """
+        Returns an independent copy of the map. Every bucket is copied the same way copy-on-write
+        copies it, so no key is hashed or put again.
+        """
+        new_hash = type(self)(self._capacity, self._hash_function)
+        new_hash._capacity = self._capacity
+        for i in range(self._capacity):
+            bucket = self._buckets.get(i)
+            if bucket is not None:
+                new_hash._buckets[i] = self._copy_bucket(bucket)
+        new_hash._size = self._size
+        return new_hash
+
+    @staticmethod
+    def _copy_bucket(bucket: LinkedList) -> LinkedList:
+        """
+        Returns a new linked list holding the same key, value pairs in the same order.
+        """
+        nodes = [node for node in bucket]
+        new_bucket = LinkedList()
+        for node in reversed(nodes):
+            new_bucket.insert(node.key, node.value)
+        return new_bucket
+
+    def _copy_on_write(self, index: int) -> None:
+        """
+        Gives every live snapshot that still reads the bucket at index from the map its own
+        copy, before the map changes that bucket.
+        """
+        copy = None
+        for snapshot in self._snapshots:
+            if index not in snapshot._saved:
+                if copy is None:
+                    copy = self._copy_bucket(self._buckets[index])
+                snapshot._saved[index] = copy
+
+    def _adopt(self, new_hash: "HashMap") -> None:
+        """
+        Takes over the buckets of another map, which is how a resize finishes.
+        """
+        # Live snapshots keep the old buckets, which are no longer changed.
+        self._release_snapshots()
+        self._capacity = new_hash.get_capacity()
+        self._buckets = new_hash._buckets
+        self._size = new_hash.get_size()
+
+    def _release_snapshots(self) -> bool:
+        """
+        Stops tracking live snapshots before the map replaces its buckets wholesale. The snapshots
+        keep the old buckets, which the map no longer changes. Returns True if there were any.
+        """
+        released = bool(self._snapshots)
+        self._snapshots = ()
+        return released
+
+    def enable_instrumentation(self, metrics: HashMapMetrics) -> None:
+        """
+        Starts recording probes, resizes and hash function time into metrics. Until this is
+        called, or after disable_instrumentation, the map runs its plain methods at no extra cost.
+        """
+        self._metrics = metrics
+        for name in _InstrumentedHashMap.METHODS:
+            # Methods a subclass overrides, such as MultiHashMap.put, keep the subclass version.
+            if getattr(type(self), name, None) is getattr(HashMap, name, None):
+                setattr(self, name, types.MethodType(getattr(_InstrumentedHashMap, name), self))
+
+    def disable_instrumentation(self) -> None:
+        """
+        Stops recording and switches the map back to its plain methods.
+        """
+        for name in _InstrumentedHashMap.METHODS:
+            self.__dict__.pop(name, None)
+        self.__dict__.pop('_metrics', None)
+
+
+class HashMapSnapshot:
+    def __init__(self, hash_map: HashMap) -> None:
+        """
+        Initialize a read-only view of hash_map as it is right now.
+        Use HashMap.snapshot() rather than creating one directly.
+        """
+        self._buckets = hash_map._buckets
+        self._capacity = hash_map._capacity
+        self._size = hash_map._size
+        self._hash_function = hash_map._hash_function
+
+        # Copies of the buckets the map changed after this snapshot was taken, by index.
+        self._saved = {}
+
+    def get_size(self) -> int:
+        """
+        Return size of the map when the snapshot was taken
+        """
+        return self._size
+
+    def get_capacity(self) -> int:
+        """
+        Return capacity of the map when the snapshot was taken
+        """
+        return self._capacity
+
+    def table_load(self) -> float:
+        """
+        Returns the load factor of the map when the snapshot was taken.
+        """
+        return self._size / self._capacity
+
+    def _bucket(self, index: int) -> LinkedList:
+        """
+        Returns the bucket at index as it was when the snapshot was taken.
+        """
+        bucket = self._saved.get(index)
+        if bucket is None:
+            bucket = self._buckets.get(index)
+        if bucket is None:
+            bucket = LinkedList()
+        return bucket
+
+    def get(self, key: str):
+        """
+        Gets a value from the snapshot.
+        """
+        node = self._bucket(self._hash_function(key) % self._capacity).contains(key)
+        if node:
+            return node.value
+        return None
+
+    def contains_key(self, key: str) -> bool:
+        """
+        Returns a bool depending on if a key is present in the snapshot.
+        """
+        if self._bucket(self._hash_function(key) % self._capacity).contains(key):
+            return True
+        return False
+
+    def get_keys_and_values(self) -> DynamicArray:
+        """
+        Returns a new array containing all the key, value pairs in the snapshot.
+        """
+        new_arr = DynamicArray()
+        for i in range(self._capacity):
+            for node in self._bucket(i):
+                new_arr.append((node.key, node.value))
+        return new_arr
+
+
+class MultiHashMap(HashMap):
+    """
+    Separate chaining multi-map. Every key holds a list of values in its node, so grouping
+    records with add costs one hash and one chain walk per record, with no new node for keys
+    that are already present. get_size counts keys, not values.
+    """
+
+    def put(self, key: str, values: list) -> None:
+        """
+        Replaces all the values of a key with a copy of values, a list like the ones get
+        returns, so put(key, get(key)) leaves the map unchanged.
+        """
+        super().put(key, list(values))
+
+    def put_one(self, key: str, value: object) -> None:
+        """
+        Replaces all the values of a key with a single value.
+        """
+        super().put(key, [value])
+
+    def add(self, key: str, value: object) -> None:
+        """
+        Adds a value to a key, after the values it already holds.
+        """
+        if self.table_load() >= self.MAX_LOAD:
+            self.resize_table(self._capacity * 2)
+
+        index = self.get_index(key, self._hash_function)
+        if self._snapshots:
+            self._copy_on_write(index)
+        bucket = self._buckets[index]
+
+        node = bucket.contains(key)
+        if node:
+            node.value.append(value)
+        else:
+            bucket.insert(key, [value])
+            self._size += 1
+
+    def _find_values(self, key: str) -> list:
+        """
+        Returns the list of values a key holds, or None if the key is not present.
+        """
+        bucket = self._buckets.get(self.get_index(key, self._hash_function))
+        node = bucket.contains(key) if bucket is not None else None
+        if node:
+            return node.value
+        return None
+
+    def get_all(self, key: str):
+        """
+        Yields every value of a key in the order they were added. Yields nothing for a key
+        that is not present.
+        """
+        values = self._find_values(key)
+        if values is not None:
+            yield from values
+
+    def count(self, key: str) -> int:
+        """
+        Returns the number of values a key holds.
+        """
+        values = self._find_values(key)
+        if values is None:
+            return 0
+        return len(values)
+
+    def remove_one(self, key: str, value: object) -> None:
+        """
+        Removes the first occurrence of a value from a key. The key itself is removed along
+        with its last value.
+        """
+        values = self._find_values(key)
+        if values is None or value not in values:
+            return
+
+        index = self.get_index(key, self._hash_function)
+        if self._snapshots:
+            self._copy_on_write(index)
+        values.remove(value)
+        if not values:
+            self._buckets[index].remove(key)
+            self._size -= 1
+
+    def _adopt(self, new_hash: "HashMap") -> None:
+        """
+        Takes over the buckets of another map, first giving live snapshots their own copy of
+        every bucket they still read from the map. A resize moves the same value lists into the
+        new table, where add and remove_one would otherwise change them under the snapshots.
+        """
+        if self._snapshots:
+            for i in range(self._capacity):
+                if self._buckets.get(i) is not None:
+                    self._copy_on_write(i)
+        super()._adopt(new_hash)
+
+    @staticmethod
+    def _copy_bucket(bucket: LinkedList) -> LinkedList:
+        """
+        Returns a new linked list holding the same keys, each with its own copy of the key's
+        value list, so that adding to the map does not change a snapshot or clone.
+        """
+        nodes = [node for node in bucket]
+        new_bucket = LinkedList()
+        for node in reversed(nodes):
+            new_bucket.insert(node.key, list(node.value))
+        return new_bucket
+
+
+class _InstrumentedHashMap:
+    """
+    Counting versions of the hot-path methods. This class is never instantiated:
+    enable_instrumentation binds its methods to a single map, so only instrumented maps run them.
+    They behave exactly like the plain methods and additionally record into self._metrics.
+    """
+
+    METHODS = ("get_index", "_find_node", "put", "get", "contains_key", "remove", "resize_table")
+
+    def get_index(self, key: str, hash_function) -> int:
+        """Returns index for hash function, recording the time spent hashing"""
+        return timed(hash_function, self._metrics, key) % self._capacity
+
+    def _find_node(self, key: str, operation: str):
+        """
+        Returns the key's node or None, recording the chain nodes visited under operation.
+        """
+        probes = 0
+        found = None
+        for node in self._buckets.get(self.get_index(key, self._hash_function)) or ():
+            probes += 1
+            if node.key == key:
+                found = node
+                break
+        self._metrics.record_operation(operation, probes)
+        return found
+
+    def put(self, key: str, value: object) -> None:
+        """
+        Puts values into a hashmap given a specified key.
+        """
+        if self.table_load() >= self.MAX_LOAD:
+            self.resize_table(self._capacity * 2)
+
+        index = self.get_index(key, self._hash_function)
+        if self._snapshots:
+            self._copy_on_write(index)
+        bucket = self._buckets[index]
+
+        probes = 0
+        for node in bucket:
+            probes += 1
+            if node.key == key:
+                bucket.remove(key)
+                bucket.insert(key, value)
+                self._metrics.record_operation("put", probes)
+                return
+        bucket.insert(key, value)
+        self._size += 1
+        self._metrics.record_operation("put", probes)
+
+    def get(self, key: str):
+        """
+        Gets a value from the hashmap.
+        """
+        node = self._find_node(key, "get")
+        if node:
+            return node.value
+        return None
+
+    def contains_key(self, key: str) -> bool:
+        """
+        Returns a bool depending on if a key is present in the hash map.
+        """
+        return self._find_node(key, "contains_key") is not None
+
+    def remove(self, key: str) -> None:
+        """
+        Removes a node using a given key from the hashmap.
+        """
+        index = self.get_index(key, self._hash_function)
+        bucket = self._buckets.get(index)
+
+        probes = 0
+        for node in bucket or ():
+            probes += 1
+            if node.key == key:
+                if self._snapshots:
+                    self._copy_on_write(index)
+                bucket.remove(key)
+                self._size -= 1
+                break
+        self._metrics.record_operation("remove", probes)
+
+    def resize_table(self, new_capacity: int, workers: int = None) -> None:
+        """
+        Resizes the table, recording the event and its duration if it happened.
+        """
+        old_capacity = self._capacity
+        old_buckets = self._buckets
+        start = time.perf_counter()
+        type(self).resize_table(self, new_capacity, workers)
+        if self._buckets is not old_buckets:
+            self._metrics.record_resize(old_capacity, self._capacity, time.perf_counter() - start)
+
 
 def find_mode(da: DynamicArray) -> (DynamicArray, int):
     """
@@ -486,3 +945,48 @@ if __name__ == "__main__":
         da = DynamicArray(case)
         mode, frequency = find_mode(da)
         print(f"Input: {da}\nMode : {mode}, Frequency: {frequency}\n")
+
+    print("\nsnapshot and clone example 1")
+    print("----------------------------")
+    m = HashMap(11, hash_function_1)
+    for i in range(5):
+        m.put(str(i), i * 10)
+    snapshot = m.snapshot()
+    copy = m.clone()
+    m.put('0', 'changed')
+    m.remove('1')
+    m.put('9', 90)
+    print(snapshot.get_keys_and_values())
+    print(m.get_keys_and_values())
+    print(copy.get_size(), copy.get('0'), copy.contains_key('9'))
+
+    print("\nmulti-map example 1")
+    print("-------------------")
+    m = MultiHashMap(11, hash_function_1)
+    for word in ["apple", "avocado", "banana", "blueberry", "cherry", "apricot"]:
+        m.add(word[0], word)
+    print(m.get_size(), m.count('a'), list(m.get_all('a')), list(m.get_all('z')))
+    m.remove_one('a', 'avocado')
+    m.remove_one('c', 'cherry')
+    print(m.get_size(), m.count('a'), m.count('c'), list(m.get_all('a')))
+
+    print("\nmulti-map example 2")
+    print("-------------------")
+    m = MultiHashMap(11, hash_function_1)
+    for i in range(20):
+        m.add(str(i % 4), i)
+    m.put_one('9', 90)
+    copy = MultiHashMap(11, hash_function_1)
+    for key, values in m.get_keys_and_values():
+        copy.put(key, values)
+    copy.add('0', 100)
+    print(copy.get_size(), copy.get('0'), m.get('0'), copy.get('9'))
+
+    print("\nmulti-map snapshot and resize example")
+    print("-------------------------------------")
+    m = MultiHashMap(11, hash_function_1)
+    m.add('a', 1)
+    snapshot = m.snapshot()
+    m.resize_table(100)
+    m.add('a', 2)
+    print(snapshot.get('a'), m.get('a'))
@@ -0,0 +1,463 @@
+# Description: This file contains IntHashMap and BytesHashMap, open addressing hash maps specialized
+# for int and bytes keys with int or float values. They use the same quadratic probing, load limit
+# and tombstone handling as the HashMap in hash_map_oa. Keys and values are stored unboxed in
+# array.array buffers instead of HashEntry objects, and empty and tombstone slots are marked
+# with sentinel values instead of None and is_tombstone. BytesHashMap keeps its keys back to back
+# in one bytearray and stores each key's offset, length and hash in arrays. get_many and put_many
+# run a whole batch of keys through one loop with the buffers bound to locals.
+
+from array import array
+
+from a6_include import DynamicArray
+from hash_map_primes import next_prime
+
+
+# IntHashMap key sentinels. These two int64 values cannot be used as keys.
+EMPTY = -2 ** 63
+TOMBSTONE = EMPTY + 1
+
+# BytesHashMap offset sentinels.
+_EMPTY_OFFSET = -1
+_TOMBSTONE_OFFSET = -2
+
+
+class _TypedHashMap:
+    # Same load limit as hash_map_oa, which keeps every quadratic probe sequence finite.
+    MAX_LOAD = .5
+
+    def __init__(self, capacity: int, typecode: str) -> None:
+        """
+        Initialize the parts shared by both typed maps. typecode is the array.array type code
+        of the values, such as 'q' for 64-bit ints or 'd' for floats.
+        """
+        self._capacity = next_prime(capacity)
+        self._typecode = typecode
+        self._size = 0
+        self._tombstones = 0
+        self._allocate()
+
+    def get_size(self) -> int:
+        """
+        Return size of map
+        """
+        return self._size
+
+    def get_capacity(self) -> int:
+        """
+        Return capacity of map
+        """
+        return self._capacity
+
+    def table_load(self) -> float:
+        """
+        Returns the current load factor of the hash table.
+        """
+        return self._size / self._capacity
+
+    def empty_buckets(self) -> int:
+        """
+        Returns the amount of empty buckets in the hash table.
+        """
+        return self._capacity - self._size
+
+    def clear(self) -> None:
+        """
+        Clears hash table and sets size to 0.
+        """
+        self._allocate()
+        self._size = 0
+        self._tombstones = 0
+
+    def resize_table(self, new_capacity: int) -> None:
+        """
+        Resizes the table to a new capacity, which is raised to the next prime. Capacities less
+        than or equal to the current size are ignored, as in hash_map_oa. Other capacities too
+        small to hold the keys below the load limit are raised to the smallest one that does,
+        since the rebuild places keys without growing the table the way put does.
+        """
+        if new_capacity <= self._size:
+            return
+        self._rebuild(next_prime(max(new_capacity, int(self._size / self.MAX_LOAD) + 1)))
+
+    def _check_load(self) -> None:
+        """
+        Grows or rehashes the table before a put, following the same rules as hash_map_oa.
+        """
+        if self._size / self._capacity >= self.MAX_LOAD:
+            self._rebuild(next_prime(self._capacity * 2))
+        elif (self._size + self._tombstones) / self._capacity >= self.MAX_LOAD:
+            if self._size * 2 / self._capacity >= self.MAX_LOAD:
+                self._rebuild(next_prime(self._capacity * 2))
+            else:
+                self._rebuild(self._capacity)
+
+    def get_many(self, keys, default=0) -> array:
+        """
+        Returns an array with the value of each key, using default for missing keys.
+        """
+        find = self._find_index
+        values = self._values
+        out = array(self._typecode)
+        append = out.append
+        for key in keys:
+            index = find(key)
+            append(default if index < 0 else values[index])
+        return out
+
+    def put_many(self, keys, values) -> None:
+        """
+        Puts every key with the value at the same position in values.
+        """
+        put = self.put
+        for key, value in zip(keys, values):
+            put(key, value)
+
+    def get(self, key) -> object:
+        """
+        Returns a key's value given a key. Returns None if no matches are found.
+        """
+        index = self._find_index(key)
+        if index < 0:
+            return None
+        return self._values[index]
+
+    def contains_key(self, key) -> bool:
+        """
+        Returns True if the key is in the hash map, otherwise False.
+        """
+        return self._find_index(key) >= 0
+
+
+class IntHashMap(_TypedHashMap):
+    def __init__(self, capacity: int = 11, typecode: str = 'q') -> None:
+        """
+        Initialize an empty map for int keys in the int64 range, apart from the two sentinels
+        EMPTY and TOMBSTONE. Keys are their own hash, reduced modulo the prime capacity.
+        """
+        super().__init__(capacity, typecode)
+
+    def _allocate(self) -> None:
+        """
+        Replaces the buffers with empty ones at the current capacity.
+        """
+        self._keys = array('q', [EMPTY]) * self._capacity
+        self._values = array(self._typecode, [0]) * self._capacity
+
+    def _rebuild(self, capacity: int) -> None:
+        """
+        Moves every live entry into new buffers of the given capacity, dropping tombstones.
+        """
+        keys = self._keys
+        values = self._values
+        self._capacity = capacity
+        self._allocate()
+        self._tombstones = 0
+        for i in range(len(keys)):
+            key = keys[i]
+            if key > TOMBSTONE:
+                self._place(key, values[i])
+
+    def _place(self, key: int, value) -> None:
+        """
+        Stores a key known not to be in the map in the first free slot of its probe sequence.
+        """
+        keys = self._keys
+        capacity = self._capacity
+        index = initial_index = key % capacity
+        probe = 1
+        while keys[index] != EMPTY:
+            index = (initial_index + probe * probe) % capacity
+            probe += 1
+        keys[index] = key
+        self._values[index] = value
+
+    def _find_index(self, key: int) -> int:
+        """
+        Returns the slot holding a key, or -1 if the key is not present.
+        """
+        # The sentinels would match empty and tombstone slots, and are never stored.
+        if key <= TOMBSTONE:
+            return -1
+        keys = self._keys
+        capacity = self._capacity
+        index = initial_index = key % capacity
+        probe = 1
+        while probe <= capacity:
+            stored = keys[index]
+            if stored == key:
+                return index
+            if stored == EMPTY:
+                return -1
+            index = (initial_index + probe * probe) % capacity
+            probe += 1
+        return -1
+
+    def get_many(self, keys, default=0) -> array:
+        """
+        Returns an array with the value of each key, using default for missing keys. The probe
+        loop is inlined, so the batch costs no method call per key.
+        """
+        table = self._keys
+        values = self._values
+        capacity = self._capacity
+        out = array(self._typecode)
+        append = out.append
+        for key in keys:
+            value = default
+            if key > TOMBSTONE:
+                index = initial_index = key % capacity
+                probe = 1
+                while probe <= capacity:
+                    stored = table[index]
+                    if stored == key:
+                        value = values[index]
+                        break
+                    if stored == EMPTY:
+                        break
+                    index = (initial_index + probe * probe) % capacity
+                    probe += 1
+            append(value)
+        return out
+
+    def put(self, key: int, value) -> None:
+        """
+        Puts a key-value pair into the map. A new key takes the first tombstone it passed on the
+        way, if there was one.
+        """
+        if key <= TOMBSTONE:
+            raise ValueError("key collides with an empty or tombstone sentinel")
+        self._check_load()
+
+        keys = self._keys
+        capacity = self._capacity
+        index = initial_index = key % capacity
+        tombstone = -1
+        probe = 1
+        while True:
+            stored = keys[index]
+            if stored == key:
+                self._values[index] = value
+                return
+            if stored == EMPTY:
+                break
+            if stored == TOMBSTONE and tombstone < 0:
+                tombstone = index
+            index = (initial_index + probe * probe) % capacity
+            probe += 1
+
+        if tombstone >= 0:
+            index = tombstone
+            self._tombstones -= 1
+        keys[index] = key
+        self._values[index] = value
+        self._size += 1
+
+    def remove(self, key: int) -> None:
+        """
+        Removes a key from the map, leaving a tombstone in its slot.
+        """
+        index = self._find_index(key)
+        if index >= 0:
+            self._keys[index] = TOMBSTONE
+            self._size -= 1
+            self._tombstones += 1
+
+    def get_keys_and_values(self) -> DynamicArray:
+        """
+        Returns a new array containing all the key, value pairs.
+        """
+        new_arr = DynamicArray()
+        keys = self._keys
+        for i in range(self._capacity):
+            if keys[i] > TOMBSTONE:
+                new_arr.append((keys[i], self._values[i]))
+        return new_arr
+
+
+class BytesHashMap(_TypedHashMap):
+    def __init__(self, capacity: int = 11, typecode: str = 'q') -> None:
+        """
+        Initialize an empty map for bytes keys. Keys are hashed with the built-in hash.
+        """
+        super().__init__(capacity, typecode)
+
+    def _allocate(self) -> None:
+        """
+        Replaces the buffers and the key storage with empty ones at the current capacity.
+        """
+        self._offsets = array('q', [_EMPTY_OFFSET]) * self._capacity
+        self._lengths = array('q', [0]) * self._capacity
+        self._hashes = array('q', [0]) * self._capacity
+        self._values = array(self._typecode, [0]) * self._capacity
+
+        # Every stored key back to back, and how many of its bytes belong to removed keys.
+        self._arena = bytearray()
+        self._garbage = 0
+
+    def _rebuild(self, capacity: int) -> None:
+        """
+        Moves every live entry into new buffers of the given capacity, dropping tombstones and
+        the bytes of removed keys.
+        """
+        offsets = self._offsets
+        lengths = self._lengths
+        hashes = self._hashes
+        values = self._values
+        arena = self._arena
+        self._capacity = capacity
+        self._allocate()
+        self._tombstones = 0
+        for i in range(len(offsets)):
+            offset = offsets[i]
+            if offset >= 0:
+                self._place(bytes(arena[offset:offset + lengths[i]]), hashes[i], values[i])
+
+    def _place(self, key: bytes, h: int, value) -> None:
+        """
+        Stores a key known not to be in the map in the first free slot of its probe sequence.
+        """
+        offsets = self._offsets
+        capacity = self._capacity
+        index = initial_index = h % capacity
+        probe = 1
+        while offsets[index] != _EMPTY_OFFSET:
+            index = (initial_index + probe * probe) % capacity
+            probe += 1
+        self._store(index, key, h, value)
+
+    def _store(self, index: int, key: bytes, h: int, value) -> None:
+        """
+        Appends a key to the key storage and points the slot at index to it.
+        """
+        self._offsets[index] = len(self._arena)
+        self._lengths[index] = len(key)
+        self._hashes[index] = h
+        self._values[index] = value
+        self._arena += key
+
+    def _find_index(self, key: bytes) -> int:
+        """
+        Returns the slot holding a key, or -1 if the key is not present. The stored hash and
+        length are compared before any key bytes.
+        """
+        h = hash(key)
+        n = len(key)
+        offsets = self._offsets
+        hashes = self._hashes
+        lengths = self._lengths
+        arena = self._arena
+        capacity = self._capacity
+        index = initial_index = h % capacity
+        probe = 1
+        while probe <= capacity:
+            offset = offsets[index]
+            if offset == _EMPTY_OFFSET:
+                return -1
+            if (offset >= 0 and hashes[index] == h and lengths[index] == n
+                    and arena[offset:offset + n] == key):
+                return index
+            index = (initial_index + probe * probe) % capacity
+            probe += 1
+        return -1
+
+    def put(self, key: bytes, value) -> None:
+        """
+        Puts a key-value pair into the map. A new key takes the first tombstone it passed on the
+        way, if there was one.
+        """
+        self._check_load()
+
+        h = hash(key)
+        n = len(key)
+        offsets = self._offsets
+        capacity = self._capacity
+        index = initial_index = h % capacity
+        tombstone = -1
+        probe = 1
+        while True:
+            offset = offsets[index]
+            if offset == _EMPTY_OFFSET:
+                break
+            if offset == _TOMBSTONE_OFFSET:
+                if tombstone < 0:
+                    tombstone = index
+            elif (self._hashes[index] == h and self._lengths[index] == n
+                    and self._arena[offset:offset + n] == key):
+                self._values[index] = value
+                return
+            index = (initial_index + probe * probe) % capacity
+            probe += 1
+
+        if tombstone >= 0:
+            index = tombstone
+            self._tombstones -= 1
+        self._store(index, key, h, value)
+        self._size += 1
+
+    def remove(self, key: bytes) -> None:
+        """
+        Removes a key from the map, leaving a tombstone in its slot. Once removed keys take up
+        half the key storage, and more bytes than the table has slots, the table is rebuilt to
+        reclaim it.
+        """
+        index = self._find_index(key)
+        if index < 0:
+            return
+        self._offsets[index] = _TOMBSTONE_OFFSET
+        self._size -= 1
+        self._tombstones += 1
+        self._garbage += self._lengths[index]
+        if self._garbage > self._capacity and self._garbage * 2 > len(self._arena):
+            self._rebuild(self._capacity)
+
+    def get_keys_and_values(self) -> DynamicArray:
+        """
+        Returns a new array containing all the key, value pairs.
+        """
+        new_arr = DynamicArray()
+        offsets = self._offsets
+        for i in range(self._capacity):
+            offset = offsets[i]
+            if offset >= 0:
+                new_arr.append((bytes(self._arena[offset:offset + self._lengths[i]]),
+                                self._values[i]))
+        return new_arr
+
+
+# ------------------- BASIC TESTING ---------------------------------------- #
+
+if __name__ == "__main__":
+
+    print("\nIntHashMap example 1")
+    print("--------------------")
+    m = IntHashMap()
+    for i in range(100):
+        m.put(i * 37, i)
+    for i in range(0, 100, 2):
+        m.remove(i * 37)
+    print(m.get_size(), m.get_capacity(), m.get(37), m.get(0), m.contains_key(74))
+    print(m.get_many([37, 74, 111], -1))
+
+    print("\nIntHashMap resize example 1")
+    print("---------------------------")
+    m = IntHashMap()
+    for i in range(40):
+        m.put(i * 7919 + 3, i)
+    m.resize_table(m.get_size() + 1)
+    result = all(m.get(i * 7919 + 3) == i for i in range(40))
+    print(m.get_size(), m.get_capacity(), m.table_load() < m.MAX_LOAD, result)
+
+    print("\nBytesHashMap example 1")
+    print("----------------------")
+    m = BytesHashMap(typecode='d')
+    for i in range(100):
+        m.put(b'key' + str(i).encode(), i / 4)
+    m.remove(b'key0')
+    print(m.get_size(), m.get_capacity(), m.get(b'key1'), m.get(b'key0'))
+    print(m.get_many([b'key2', b'key0', b'key99'], -1.0))
+
+    print("\nBytesHashMap resize example 1")
+    print("-----------------------------")
+    m.resize_table(m.get_size() + 1)
+    result = all(m.get(b'key' + str(i).encode()) == i / 4 for i in range(1, 100))
+    print(m.get_size(), m.get_capacity(), m.table_load() < m.MAX_LOAD, result)